@@ -10,5 +10,63 @@ WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
 PORT = int(os.getenv("PORT", 8000))
 
+# /metrics uchun maxfiy token (bo'sh bo'lsa endpoint o'chiq)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Telegram webhookga parallel ulanishlar: oddiy rejim va restartdan keyingi backlog
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+WEBHOOK_CATCHUP_CONNECTIONS = int(os.getenv("WEBHOOK_CATCHUP_CONNECTIONS", 100))
+
+# Web workerlar soni (1 - bitta jarayon) va har bir worker uchun asyncpg pool
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 5))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 20))
+# Har bir update ning barcha so'rovlari bitta tranzaksiyada bajarilsinmi
+DB_REQUEST_TRANSACTION = os.getenv("DB_REQUEST_TRANSACTION", "0") == "1"
+# Update lar egallay olmaydigan ulanishlar (dedup, batch writerlar, fon joblari uchun)
+DB_POOL_RESERVED = int(os.getenv("DB_POOL_RESERVED", 5))
+
+# Webhook yangilanishlari navbati: parallel workerlar (shardlar) va navbat hajmi
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 32))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 2000))
+
+# Qayta yuborilgan yangilanishlarni aniqlash: oxirgi update_id lar oynasi
+# UPDATE_DEDUP_SHARED - workerlar orasida Postgres orqali (bir nechta workerda default)
+UPDATE_DEDUP_SIZE = int(os.getenv("UPDATE_DEDUP_SIZE", 10000))
+UPDATE_DEDUP_SHARED = os.getenv("UPDATE_DEDUP_SHARED", "1" if WEB_WORKERS > 1 else "0") == "1"
+UPDATE_DEDUP_TTL = int(os.getenv("UPDATE_DEDUP_TTL", 3600))
+
 # Admin contact link (default)
 ADMIN_CONTACT_LINK = "https://t.me/forever_projects"
+
+# Broadcast sozlamalari (Telegram ~30 msg/s limit)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 25))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 20))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", 500))
+
+# Kanal obunasi keshi (sekund)
+SUBSCRIPTION_CACHE_TTL = int(os.getenv("SUBSCRIPTION_CACHE_TTL", 600))
+SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", 20))
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", 200000))
+CHANNELS_CACHE_TTL = int(os.getenv("CHANNELS_CACHE_TTL", 60))
+# chat_member yangilanishlaridan olingan a'zolikka ishonch muddati
+CHANNEL_MEMBER_TTL = int(os.getenv("CHANNEL_MEMBER_TTL", 86400))
+
+# Kunlik statistika rollup yangilanish oralig'i (sekund)
+DAILY_STATS_INTERVAL = int(os.getenv("DAILY_STATS_INTERVAL", 60))
+
+# film_views oylik partitsiyalari: necha oy saqlanadi (0 - cheklovsiz, arxivlash o'chiq)
+# Eski oylar FILM_VIEWS_ARCHIVE_DIR ga eksport qilinib, bazadan o'chiriladi - bu papka
+# doimiy diskda bo'lishi shart (absolyut yo'l, masalan Render Persistent Disk);
+# Render ning oddiy diski har deployda tozalanadi
+FILM_VIEWS_RETENTION_MONTHS = int(os.getenv("FILM_VIEWS_RETENTION_MONTHS", 0))
+FILM_VIEWS_ARCHIVE_DIR = os.getenv("FILM_VIEWS_ARCHIVE_DIR", "")
+FILM_VIEWS_MAINTENANCE_INTERVAL = int(os.getenv("FILM_VIEWS_MAINTENANCE_INTERVAL", 3600))
+
+# Ma'lum foydalanuvchilar profillari keshi (/start yozuvlarini kamaytirish uchun)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 500000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 86400))
+
+# FSM holatlari: tashlab ketilgan holatlar muddati va lokal kesh (sekund)
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", 86400))
+FSM_CACHE_TTL = int(os.getenv("FSM_CACHE_TTL", 300))
@@ -1,3 +1,4 @@
 from .db import db
+from .catalog import catalog
 
-__all__ = ['db']
+__all__ = ['db', 'catalog']
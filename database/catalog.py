@@ -0,0 +1,103 @@
+import logging
+from typing import Dict, List, Optional
+
+from database.db import db, FilmBundle, FILM_CATALOG_CHANNEL
+from database.listener import pg_listener
+
+logger = logging.getLogger(__name__)
+
+
+class FilmCatalog:
+    """
+    films + film_parts jadvallarining xotiradagi nusxasi (kod bo'yicha)
+    Startda to'liq yuklanadi, keyin Postgres LISTEN/NOTIFY orqali yangilanadi -
+    kinoni kod bo'yicha berish bazaga murojaat qilmaydi
+    """
+
+    def __init__(self):
+        self._films: Dict[str, dict] = {}
+        self._parts: Dict[str, List[dict]] = {}
+        self._ready = False
+        # Yuklash davomida kelgan o'zgarishlar (yuklashdan keyin qayta o'qiladi)
+        self._dirty: Optional[set] = None
+        # Hozir qayta o'qilayotgan kodlar -> o'qish davomida yangi NOTIFY kelganmi
+        self._refreshing: Dict[str, bool] = {}
+
+    async def start(self):
+        """O'zgarishlarni tinglashni boshlash va snapshotni yuklash"""
+        await pg_listener.subscribe(FILM_CATALOG_CHANNEL, self._on_notify, self.load)
+        await self.load()
+
+    async def stop(self):
+        self._ready = False
+
+    async def load(self):
+        """Butun katalogni qayta yuklash"""
+        self._dirty = set()
+        try:
+            bundles = await db.get_all_film_bundles()
+        except Exception:
+            self._dirty = None
+            raise
+
+        # refresh() bilan bir xil ko'rinish: kino va qismlar - dict
+        self._films = {b.film['code']: b.film for b in bundles}
+        self._parts = {b.film['code']: b.parts for b in bundles}
+        dirty, self._dirty = self._dirty, None
+        for code in dirty:
+            await self.refresh(code)
+        self._ready = True
+        parts_total = sum(len(parts) for parts in self._parts.values())
+        logger.info(f"Kino katalogi yuklandi: {len(self._films)} ta kino, {parts_total} ta qism")
+
+    async def refresh(self, code: str):
+        """
+        Bitta kinoni bazadan qayta o'qish
+        Bir kod uchun bir vaqtda bitta o'qish: o'qish davomida yangi NOTIFY kelsa,
+        eski natija yangisini bosib qo'ymasligi uchun qayta o'qiladi
+        """
+        if code in self._refreshing:
+            self._refreshing[code] = True
+            return
+        self._refreshing[code] = False
+        try:
+            while True:
+                bundle = await db.get_film_bundle(code)
+                if bundle is None:
+                    self._films.pop(code, None)
+                    self._parts.pop(code, None)
+                else:
+                    self._films[code] = bundle.film
+                    self._parts[code] = bundle.parts
+                if not self._refreshing[code]:
+                    break
+                self._refreshing[code] = False
+        finally:
+            del self._refreshing[code]
+
+    async def _on_notify(self, code: str):
+        if self._dirty is not None:
+            self._dirty.add(code)
+        await self.refresh(code)
+
+    # =============== READ API ===============
+
+    async def get_film_bundle(self, code: str) -> Optional[FilmBundle]:
+        """Kino, qismlari va qismlar soni (snapshot tayyor bo'lmasa - bitta so'rov)"""
+        if self._ready:
+            film = self._films.get(code)
+            if film is None:
+                return None
+            parts = self._parts.get(code, [])
+            return FilmBundle(film, parts, len(parts))
+        return await db.get_film_bundle(code)
+
+    async def get_films_count(self):
+        """Jami kinolar soni"""
+        if self._ready:
+            return len(self._films)
+        return await db.get_films_count()
+
+
+# Global katalog
+catalog = FilmCatalog()
@@ -1,18 +1,110 @@
+import asyncio
 import asyncpg
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+from contextvars import ContextVar
+from typing import Optional, List, Dict, NamedTuple
 import config
+from database.listener import pg_listener
+from database.migrations import run_migrations
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock uchun broadcast joblar nomlar maydoni
+BROADCAST_LOCK_NAMESPACE = 7301
+# Fon xizmatlari (bir vaqtda bitta jarayon): film_views partitsiyalari, daily_stats rollup
+FILM_VIEWS_MAINTENANCE_LOCK_ID = 7302
+DAILY_STATS_LOCK_ID = 7303
+
+# Oylik film_views partitsiyalari nomi: film_views_pYYYYMM
+FILM_VIEWS_PARTITION_RE = re.compile(r'^film_views_p(\d{4})(\d{2})$')
+
+# Kino katalogi o'zgarganda NOTIFY yuboriladigan kanal (payload - kino kodi)
+FILM_CATALOG_CHANNEL = 'film_catalog'
+
+# Adminlar ro'yxati o'zgarganda NOTIFY kanali (payload - user_id)
+ADMINS_CHANNEL = 'admins_changed'
+
+# Sozlama o'zgarganda NOTIFY kanali (payload - sozlama kaliti)
+SETTINGS_CHANNEL = 'settings_changed'
+
+# FSM holati o'zgarganda NOTIFY kanali (payload - "jarayon_tokeni kalit")
+FSM_CHANNEL = 'fsm_changed'
+
+
+class FilmBundle(NamedTuple):
+    """Kino, uning qismlari (part_number bo'yicha) va qismlar soni"""
+    film: dict
+    parts: List[dict]
+    parts_count: int
+
+
+# Kino + qismlari (JSON massiv, part_number bo'yicha) - get_film_bundle va katalog uchun
+FILM_BUNDLE_QUERY = '''
+    SELECT f.*, p.parts
+    FROM films f
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg(fp ORDER BY fp.part_number), '[]') AS parts
+        FROM (
+            SELECT film_parts.*, f.code AS film_code
+            FROM film_parts WHERE film_parts.film_id = f.id
+        ) fp
+    ) p
+'''
+
+
+class RequestScope:
+    """
+    Bitta update uchun umumiy ulanish: birinchi so'rovda pool dan olinadi,
+    update tugaganda qaytariladi (transactional=True - butun update bitta tranzaksiyada)
+    Faqat scope ochgan task ichida ishlatiladi - fon tasklari (create_task) o'z
+    ulanishini pool dan oladi
+    """
+
+    __slots__ = ('task', 'transactional', 'conn', 'tx', 'calls', 'acquires', 'closed')
+
+    def __init__(self, transactional: bool = False):
+        self.task = asyncio.current_task()
+        self.transactional = transactional
+        self.conn: Optional[asyncpg.Connection] = None
+        self.tx = None
+        self.calls = 0
+        self.acquires = 0
+        self.closed = False
+
+
+_request_scope: ContextVar[Optional[RequestScope]] = ContextVar('db_request_scope', default=None)
+
 
 class Database:
     def __init__(self):
         self.pool = None
+        # request_scope statistikasi: updatelar, Database chaqiruvlari, pool dan olingan ulanishlar
+        self.request_stats = {'updates': 0, 'calls': 0, 'acquires': 0}
+        self._scope_slots: Optional[asyncio.Semaphore] = None
+        # Adminlar ruxsatlari: user_id -> permissions (None - hali yuklanmagan)
+        self._admins: Optional[Dict[int, List[str]]] = None
+        # Majburiy kanallar ro'yxati keshi: (yozuvlar, muddati)
+        self._channels_cache = None
+        self._channels_cache_expires = 0.0
     
     async def connect(self):
         """Database bilan ulanish"""
         self.pool = await asyncpg.create_pool(
             config.DATABASE_URL,
-            min_size=5,
-            max_size=20
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE
+        )
+        # transactional update lar bir vaqtda egallashi mumkin bo'lgan ulanishlar -
+        # qolgani dedup, batch writerlar va fon joblari uchun zaxira
+        self._scope_slots = asyncio.Semaphore(
+            max(1, config.DB_POOL_MAX_SIZE - config.DB_POOL_RESERVED)
         )
     
     async def disconnect(self):
@@ -20,318 +112,829 @@ class Database:
         if self.pool:
             await self.pool.close()
     
+    @asynccontextmanager
+    async def _acquire(self):
+        """Ulanish: update doirasida (request_scope) - umumiy, aks holda pool dan"""
+        scope = _request_scope.get()
+        if scope is not None and not scope.closed:
+            scope.calls += 1
+        if scope is None or scope.closed or scope.task is not asyncio.current_task():
+            if scope is not None and not scope.closed:
+                scope.acquires += 1
+            async with self.pool.acquire() as conn:
+                yield conn
+            return
+
+        if scope.conn is None:
+            # Ulanish update oxirigacha band turadi - bir vaqtdagi scopelar soni
+            # cheklangan, pool ning qolgani dedup, batch writerlar va fon joblari uchun
+            await self._scope_slots.acquire()
+            try:
+                scope.conn = await self.pool.acquire()
+                scope.acquires += 1
+                if scope.transactional:
+                    scope.tx = scope.conn.transaction()
+                    await scope.tx.start()
+            except BaseException:
+                if scope.conn is not None:
+                    await self.pool.release(scope.conn)
+                    scope.conn = None
+                self._scope_slots.release()
+                raise
+
+        try:
+            yield scope.conn
+        except asyncpg.PostgresError:
+            if scope.tx is not None:
+                # Xatolik tranzaksiyani buzdi: handler uni ushlab davom etsa ham keyingi
+                # so'rovlar ishlashi uchun - rollback va yangi tranzaksiya
+                logger.warning("Update tranzaksiyasi DB xatoligi sababli bekor qilindi")
+                await scope.tx.rollback()
+                scope.tx = scope.conn.transaction()
+                await scope.tx.start()
+            raise
+    
+    @asynccontextmanager
+    async def request_scope(self, transactional: bool = False):
+        """
+        Update davomida barcha Database chaqiruvlari uchun bitta ulanish
+        transactional=True - hammasi bitta tranzaksiyada (xatolikda rollback)
+        """
+        scope = RequestScope(transactional)
+        token = _request_scope.set(scope)
+        try:
+            yield scope
+            if scope.tx is not None:
+                await scope.tx.commit()
+        except BaseException:
+            if scope.tx is not None and not scope.conn.is_closed():
+                await scope.tx.rollback()
+            raise
+        finally:
+            scope.closed = True
+            _request_scope.reset(token)
+            if scope.conn is not None:
+                await self.pool.release(scope.conn)
+                self._scope_slots.release()
+            self.request_stats['updates'] += 1
+            self.request_stats['calls'] += scope.calls
+            self.request_stats['acquires'] += scope.acquires
+    
     async def create_tables(self):
-        """Barcha jadvallarni yaratish"""
+        """Jadvallarni yaratish / sxemani oxirgi versiyaga keltirish (migratsiyalar)"""
         async with self.pool.acquire() as conn:
-            # Users jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    username VARCHAR(255),
-                    full_name VARCHAR(255),
-                    joined_date TIMESTAMP DEFAULT NOW(),
-                    is_blocked BOOLEAN DEFAULT FALSE
-                )
-            ''')
-            
-            # Films jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS films (
-                    id SERIAL PRIMARY KEY,
-                    code VARCHAR(50) UNIQUE NOT NULL,
-                    name VARCHAR(255) NOT NULL,
-                    description TEXT,
-                    thumbnail_file_id VARCHAR(255),
-                    created_date TIMESTAMP DEFAULT NOW()
-                )
-            ''')
-            
-            # Film parts jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS film_parts (
-                    id SERIAL PRIMARY KEY,
-                    film_code VARCHAR(50) REFERENCES films(code) ON DELETE CASCADE,
-                    part_number INTEGER NOT NULL,
-                    video_file_id VARCHAR(255) NOT NULL,
-                    added_date TIMESTAMP DEFAULT NOW(),
-                    UNIQUE(film_code, part_number)
-                )
-            ''')
-            
-            # Film views jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS film_views (
-                    id SERIAL PRIMARY KEY,
-                    film_code VARCHAR(50) REFERENCES films(code) ON DELETE CASCADE,
-                    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
-                    viewed_date TIMESTAMP DEFAULT NOW()
-                )
-            ''')
-            
-            # Channels jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS channels (
-                    id SERIAL PRIMARY KEY,
-                    channel_id BIGINT UNIQUE NOT NULL,
-                    channel_username VARCHAR(255),
-                    channel_title VARCHAR(255),
-                    added_date TIMESTAMP DEFAULT NOW()
-                )
-            ''')
-            
-            # Admins jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS admins (
-                    user_id BIGINT PRIMARY KEY,
-                    permissions TEXT[] DEFAULT ARRAY[]::TEXT[],
-                    added_by BIGINT,
-                    added_date TIMESTAMP DEFAULT NOW()
-                )
-            ''')
-            
-            # Settings jadvali
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    key VARCHAR(255) PRIMARY KEY,
-                    value TEXT
-                )
-            ''')
-            
-            # Admin contact link ni sozlamalarga qo'shish
-            await conn.execute('''
-                INSERT INTO settings (key, value)
-                VALUES ('admin_contact_link', $1)
-                ON CONFLICT (key) DO NOTHING
-            ''', config.ADMIN_CONTACT_LINK)
+            return await run_migrations(conn)
     
     # =============== USER METHODS ===============
     
     async def add_user(self, user_id: int, username: str = None, full_name: str = None):
         """Yangi foydalanuvchi qo'shish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('''
                 INSERT INTO users (user_id, username, full_name)
                 VALUES ($1, $2, $3)
                 ON CONFLICT (user_id) DO UPDATE
                 SET username = $2, full_name = $3
+                WHERE (users.username, users.full_name) IS DISTINCT FROM ($2, $3)
             ''', user_id, username, full_name)
     
+    async def upsert_users(self, records: List[tuple]):
+        """
+        (user_id, username, full_name) yozuvlarini bitta so'rovda saqlash
+        Profil o'zgarmagan qatorlar qayta yozilmaydi (dead tuple / WAL yo'q)
+        """
+        if not records:
+            return
+        user_ids, usernames, full_names = zip(*records)
+        async with self._acquire() as conn:
+            await conn.execute('''
+                INSERT INTO users (user_id, username, full_name)
+                SELECT * FROM UNNEST($1::BIGINT[], $2::VARCHAR[], $3::VARCHAR[])
+                ON CONFLICT (user_id) DO UPDATE
+                SET username = EXCLUDED.username, full_name = EXCLUDED.full_name
+                WHERE (users.username, users.full_name)
+                      IS DISTINCT FROM (EXCLUDED.username, EXCLUDED.full_name)
+            ''', list(user_ids), list(usernames), list(full_names))
+    
     async def get_user(self, user_id: int):
         """Foydalanuvchi ma'lumotlarini olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetchrow('SELECT * FROM users WHERE user_id = $1', user_id)
     
+    async def set_users_blocked(self, user_ids: List[int], blocked: bool):
+        """Bir nechta foydalanuvchining is_blocked holatini bitta so'rovda o'zgartirish"""
+        if not user_ids:
+            return
+        async with self._acquire() as conn:
+            await conn.execute('''
+                UPDATE users SET is_blocked = $2
+                WHERE user_id = ANY($1::BIGINT[]) AND is_blocked IS DISTINCT FROM $2
+            ''', user_ids, blocked)
+    
     async def get_all_users(self):
         """Barcha foydalanuvchilarni olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetch('SELECT user_id FROM users WHERE is_blocked = FALSE')
     
+    async def get_active_users_count(self):
+        """Botni bloklamagan foydalanuvchilar soni"""
+        async with self._acquire() as conn:
+            return await conn.fetchval('SELECT COUNT(*) FROM users WHERE is_blocked = FALSE')
+    
+    async def get_users_batch(self, after_user_id: int = 0, limit: int = 500):
+        """user_id bo'yicha keyingi faol foydalanuvchilar to'plami (keyset)"""
+        async with self._acquire() as conn:
+            rows = await conn.fetch('''
+                SELECT user_id FROM users
+                WHERE is_blocked = FALSE AND user_id > $1
+                ORDER BY user_id
+                LIMIT $2
+            ''', after_user_id, limit)
+            return [row['user_id'] for row in rows]
+    
+    async def iter_active_user_ids(self, after_user_id: int = 0, batch_size: int = 1000):
+        """
+        Faol foydalanuvchilarni oqim (stream) sifatida berish
+        Keyset to'plamlar: keyingi to'plam joriysi ishlanayotganda oldindan olinadi,
+        xotira auditoriya hajmiga bog'liq emas
+        """
+        pending = asyncio.ensure_future(self.get_users_batch(after_user_id, batch_size))
+        try:
+            while pending is not None:
+                batch = await pending
+                pending = None
+                if len(batch) == batch_size:
+                    pending = asyncio.ensure_future(self.get_users_batch(batch[-1], batch_size))
+                for user_id in batch:
+                    yield user_id
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
     async def get_users_count(self):
         """Jami foydalanuvchilar soni"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetchval('SELECT COUNT(*) FROM users')
     
-    async def get_users_by_period(self, days: int):
-        """Ma'lum davr ichida qo'shilgan foydalanuvchilar soni"""
-        async with self.pool.acquire() as conn:
-            date_from = datetime.now() - timedelta(days=days)
-            return await conn.fetchval('''
-                SELECT COUNT(*) FROM users 
-                WHERE joined_date >= $1
-            ''', date_from)
-    
-    async def get_daily_views(self):
-        """Kunlik ko'rishlar soni"""
-        async with self.pool.acquire() as conn:
-            today = datetime.now().date()
-            return await conn.fetchval('''
-                SELECT COUNT(*) FROM film_views 
-                WHERE DATE(viewed_date) = $1
+    async def get_user_statistics(self):
+        """
+        Admin "User Statistic" ekrani uchun barcha ko'rsatkichlar - bitta so'rovda
+        total - users jadvalidan (rollup oynasidan oldingi foydalanuvchilar ham),
+        qolganlari - daily_stats rollupidan
+        Returns: total, daily, weekly, monthly, daily_views, daily_viewers
+        """
+        today = datetime.now().date()
+        async with self._acquire() as conn:
+            return await conn.fetchrow('''
+                SELECT
+                    (SELECT COUNT(*) FROM users) AS total,
+                    COALESCE(SUM(new_users) FILTER (WHERE day = $1::date), 0) AS daily,
+                    COALESCE(SUM(new_users) FILTER (WHERE day > $1::date - 7), 0) AS weekly,
+                    COALESCE(SUM(new_users) FILTER (WHERE day > $1::date - 30), 0) AS monthly,
+                    COALESCE(SUM(views) FILTER (WHERE day = $1::date), 0) AS daily_views,
+                    COALESCE(SUM(unique_viewers) FILTER (WHERE day = $1::date), 0) AS daily_viewers
+                FROM daily_stats
+                WHERE day > $1::date - 30
             ''', today)
     
+    # =============== DAILY STATS ROLLUP ===============
+    
+    async def refresh_daily_stats(self, date_from, date_to):
+        """
+        [date_from, date_to] kunlari uchun rollupni qayta hisoblash
+        Faqat oraliq (range) shartlari - indekslardan foydalana oladi
+        """
+        async with self._acquire() as conn:
+            await conn.execute('''
+                INSERT INTO daily_stats (day, new_users, views, unique_viewers)
+                SELECT
+                    d.day,
+                    (SELECT COUNT(*) FROM users
+                     WHERE joined_date >= d.day AND joined_date < d.day + 1),
+                    (SELECT COUNT(*) FROM film_views
+                     WHERE viewed_date >= d.day AND viewed_date < d.day + 1),
+                    (SELECT COUNT(DISTINCT user_id) FROM film_views
+                     WHERE viewed_date >= d.day AND viewed_date < d.day + 1)
+                FROM (SELECT generate_series($1::date, $2::date, interval '1 day')::date AS day) d
+                ON CONFLICT (day) DO UPDATE
+                SET new_users = EXCLUDED.new_users,
+                    views = EXCLUDED.views,
+                    unique_viewers = EXCLUDED.unique_viewers
+            ''', date_from, date_to)
+    
     # =============== FILM METHODS ===============
     
+    async def _notify_film_changed(self, conn, code: str):
+        """Katalog snapshotlariga kino o'zgarganini bildirish"""
+        await pg_listener.notify(conn, FILM_CATALOG_CHANNEL, code)
+    
     async def add_film(self, code: str, name: str, description: str, thumbnail_file_id: str):
         """Yangi kino qo'shish"""
-        async with self.pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO films (code, name, description, thumbnail_file_id)
-                VALUES ($1, $2, $3, $4)
-            ''', code, name, description, thumbnail_file_id)
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                film_id = await conn.fetchval('''
+                    INSERT INTO films (code, name, description, thumbnail_file_id)
+                    VALUES ($1, $2, $3, $4)
+                    RETURNING id
+                ''', code, name, description, thumbnail_file_id)
+                await conn.execute('''
+                    INSERT INTO film_view_counts (film_id) VALUES ($1)
+                    ON CONFLICT (film_id) DO NOTHING
+                ''', film_id)
+                await self._notify_film_changed(conn, code)
     
     async def get_film(self, code: str):
-        """Kino ma'lumotlarini olish"""
-        async with self.pool.acquire() as conn:
+        """Kino ma'lumotlarini olish (parts_count bilan)"""
+        async with self._acquire() as conn:
             return await conn.fetchrow('SELECT * FROM films WHERE code = $1', code)
     
+    @staticmethod
+    def _film_bundle(row) -> FilmBundle:
+        film = dict(row)
+        parts = json.loads(film.pop('parts'))
+        return FilmBundle(film, parts, film['parts_count'])
+    
+    async def get_film_bundle(self, code: str) -> Optional[FilmBundle]:
+        """Kino, qismlari va qismlar soni - bitta so'rovda. Kino topilmasa None"""
+        async with self._acquire() as conn:
+            row = await conn.fetchrow(FILM_BUNDLE_QUERY + ' WHERE f.code = $1', code)
+        return self._film_bundle(row) if row else None
+    
+    async def get_all_film_bundles(self) -> List[FilmBundle]:
+        """Barcha kinolar qismlari bilan (katalog uchun) - bitta so'rovda"""
+        async with self._acquire() as conn:
+            rows = await conn.fetch(FILM_BUNDLE_QUERY)
+        return [self._film_bundle(row) for row in rows]
+    
     async def delete_film(self, code: str):
         """Kinoni o'chirish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('DELETE FROM films WHERE code = $1', code)
+            await self._notify_film_changed(conn, code)
     
     async def get_all_films(self):
         """Barcha kinolarni olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetch('SELECT code, name FROM films ORDER BY created_date DESC')
     
-    async def get_films_paginated(self, offset: int = 0, limit: int = 30):
-        """Sahifalangan kinolar ro'yxati"""
-        async with self.pool.acquire() as conn:
-            films = await conn.fetch('''
-                SELECT code, name FROM films 
-                ORDER BY created_date DESC
-                LIMIT $1 OFFSET $2
-            ''', limit, offset)
-            total = await conn.fetchval('SELECT COUNT(*) FROM films')
-            return films, total
+    async def get_films_page(self, cursor: Optional[tuple] = None, direction: str = 'next', limit: int = 30):
+        """
+        Kinolar ro'yxatining bir sahifasi - keyset (created_date, id) bo'yicha
+        cursor - (created_date, id): 'next' uchun joriy sahifaning oxirgi,
+        'prev' uchun birinchi qatori. Har bir sahifa chuqurlikdan qat'i nazar bir xil turadi
+        """
+        async with self._acquire() as conn:
+            if cursor is None:
+                return await conn.fetch('''
+                    SELECT id, code, name, created_date FROM films
+                    ORDER BY created_date DESC, id DESC
+                    LIMIT $1
+                ''', limit)
+            if direction == 'prev':
+                films = await conn.fetch('''
+                    SELECT id, code, name, created_date FROM films
+                    WHERE (created_date, id) > ($1, $2)
+                    ORDER BY created_date ASC, id ASC
+                    LIMIT $3
+                ''', cursor[0], cursor[1], limit)
+                return list(reversed(films))
+            return await conn.fetch('''
+                SELECT id, code, name, created_date FROM films
+                WHERE (created_date, id) < ($1, $2)
+                ORDER BY created_date DESC, id DESC
+                LIMIT $3
+            ''', cursor[0], cursor[1], limit)
+    
+    async def get_films_count(self):
+        """Jami kinolar soni"""
+        async with self._acquire() as conn:
+            return await conn.fetchval('SELECT COUNT(*) FROM films')
     
     # =============== FILM PARTS METHODS ===============
     
     async def add_film_part(self, film_code: str, part_number: int, video_file_id: str):
         """Kino qismi qo'shish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
+            # Kino topilmasa film_id NULL - NOT NULL xatoligi
             await conn.execute('''
-                INSERT INTO film_parts (film_code, part_number, video_file_id)
-                VALUES ($1, $2, $3)
+                INSERT INTO film_parts (film_id, part_number, video_file_id)
+                VALUES ((SELECT id FROM films WHERE code = $1), $2, $3)
             ''', film_code, part_number, video_file_id)
+            await self._notify_film_changed(conn, film_code)
     
     async def get_film_parts(self, film_code: str):
         """Kino qismlarini olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetch('''
-                SELECT * FROM film_parts 
-                WHERE film_code = $1 
-                ORDER BY part_number
+                SELECT fp.*, f.code AS film_code
+                FROM film_parts fp
+                JOIN films f ON f.id = fp.film_id
+                WHERE f.code = $1
+                ORDER BY fp.part_number
             ''', film_code)
     
     async def get_film_part(self, film_code: str, part_number: int):
         """Bitta kino qismini olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetchrow('''
-                SELECT * FROM film_parts 
-                WHERE film_code = $1 AND part_number = $2
+                SELECT fp.*, f.code AS film_code
+                FROM film_parts fp
+                JOIN films f ON f.id = fp.film_id
+                WHERE f.code = $1 AND fp.part_number = $2
             ''', film_code, part_number)
     
     async def delete_film_part(self, film_code: str, part_number: int):
         """Kino qismini o'chirish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('''
-                DELETE FROM film_parts 
-                WHERE film_code = $1 AND part_number = $2
+                DELETE FROM film_parts fp
+                USING films f
+                WHERE f.id = fp.film_id AND f.code = $1 AND fp.part_number = $2
             ''', film_code, part_number)
+            await self._notify_film_changed(conn, film_code)
     
     async def get_parts_count(self, film_code: str):
-        """Kino qismlari soni"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetchval('''
-                SELECT COUNT(*) FROM film_parts WHERE film_code = $1
-            ''', film_code)
+        """Kino qismlari soni (trigger bilan yuritiladigan films.parts_count)"""
+        async with self._acquire() as conn:
+            count = await conn.fetchval('SELECT parts_count FROM films WHERE code = $1', film_code)
+            return count or 0
     
     # =============== FILM VIEWS METHODS ===============
     
     async def add_film_view(self, film_code: str, user_id: int):
         """Kino ko'rilganini qayd qilish"""
-        async with self.pool.acquire() as conn:
-            await conn.execute('''
-                INSERT INTO film_views (film_code, user_id)
-                VALUES ($1, $2)
-            ''', film_code, user_id)
+        await self.add_film_views([(film_code, user_id, datetime.now())])
+    
+    async def add_film_views(self, views: List[tuple]):
+        """
+        Ko'rishlarni bitta so'rov bilan qayd qilish
+        views - (film_code, user_id, viewed_date) ro'yxati
+        O'chirilgan kino yozuvlari tashlab yuboriladi; bazada hali yo'q foydalanuvchi
+        uchun minimal users yozuvi yaratiladi - ko'rish yo'qolmaydi
+        """
+        if not views:
+            return
+        film_codes, user_ids, dates = zip(*views)
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                # /start i boshqa workerning buferida turgan yangi foydalanuvchi -
+                # minimal yozuv (profil o'sha worker flush qilganda to'ldiriladi)
+                # Faqat haqiqatan yo'q ID lar: mavjud qatorlarga tegilmaydi
+                await conn.execute('''
+                    INSERT INTO users (user_id)
+                    SELECT DISTINCT v.u FROM UNNEST($1::BIGINT[]) AS v(u)
+                    WHERE NOT EXISTS (SELECT 1 FROM users WHERE users.user_id = v.u)
+                    ON CONFLICT (user_id) DO NOTHING
+                ''', list(user_ids))
+                # Ko'rishlar va hisoblagichlar bitta so'rovda (atomar) yangilanadi
+                await conn.execute('''
+                    WITH inserted AS (
+                        INSERT INTO film_views (film_id, user_id, viewed_date)
+                        SELECT f.id, v.user_id, v.viewed_date
+                        FROM UNNEST($1::VARCHAR[], $2::BIGINT[], $3::TIMESTAMP[]) AS v(film_code, user_id, viewed_date)
+                        JOIN films f ON f.code = v.film_code
+                        RETURNING film_id
+                    )
+                    INSERT INTO film_view_counts (film_id, views_count)
+                    SELECT film_id, COUNT(*) FROM inserted GROUP BY film_id
+                    ON CONFLICT (film_id) DO UPDATE
+                    SET views_count = film_view_counts.views_count + EXCLUDED.views_count
+                ''', list(film_codes), list(user_ids), list(dates))
     
     async def get_top_films(self, limit: int = 20):
         """Eng ko'p ko'rilgan kinolar"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
+            # film_view_counts (views_count DESC) indeksi bo'yicha skan
             return await conn.fetch('''
-                SELECT f.name, f.code, COUNT(fv.id) as views_count
-                FROM films f
-                LEFT JOIN film_views fv ON f.code = fv.film_code
-                GROUP BY f.code, f.name
-                ORDER BY views_count DESC
+                SELECT f.name, f.code, c.views_count
+                FROM film_view_counts c
+                JOIN films f ON f.id = c.film_id
+                ORDER BY c.views_count DESC
                 LIMIT $1
             ''', limit)
     
+    # =============== FILM VIEWS PARTITIONS ===============
+    
+    async def ensure_film_views_partitions(self, months_ahead: int = 2):
+        """Joriy va keyingi months_ahead oy uchun partitsiyalarni oldindan yaratish"""
+        async with self._acquire() as conn:
+            await conn.execute('''
+                SELECT ensure_film_views_partition(m::date)
+                FROM generate_series(
+                    date_trunc('month', NOW()),
+                    date_trunc('month', NOW()) + make_interval(months => $1),
+                    INTERVAL '1 month'
+                ) AS m
+            ''', months_ahead)
+    
+    async def get_film_views_partitions(self):
+        """
+        Oylik partitsiyalar (ulangan va arxivlash paytida ajratib qo'yilganlari)
+        Returns: [(nomi, oy boshi, ulanganmi)] - eskisi birinchi
+        """
+        async with self._acquire() as conn:
+            rows = await conn.fetch('''
+                SELECT relname, relispartition FROM pg_class
+                WHERE relkind = 'r' AND relname LIKE 'film_views_p%'
+            ''')
+        partitions = []
+        for row in rows:
+            match = FILM_VIEWS_PARTITION_RE.match(row['relname'])
+            if match:
+                month = datetime(int(match.group(1)), int(match.group(2)), 1).date()
+                partitions.append((row['relname'], month, row['relispartition']))
+        return sorted(partitions, key=lambda p: p[1])
+    
+    async def archive_film_views_partition(self, name: str, month, attached: bool, archive_dir: str):
+        """
+        Eski oy partitsiyasini arxivlash:
+        daily_stats ni yangilash -> ajratish (DETACH) -> film_views_monthly ga yig'ish ->
+        gzip CSV ga eksport -> DROP
+        Har bir qadam qayta bajarilsa ham xavfsiz (crashdan keyin davom etadi)
+        Returns: arxiv fayli yo'li
+        """
+        if not FILM_VIEWS_PARTITION_RE.match(name):
+            raise ValueError(f"Noto'g'ri partitsiya nomi: {name}")
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+        if attached:
+            # Kunlik rollup partitsiya hali film_views ichida turganda
+            await self.refresh_daily_stats(month, next_month - timedelta(days=1))
+            async with self.pool.acquire() as conn:
+                await conn.execute(f'ALTER TABLE film_views DETACH PARTITION {name}')
+
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f'{name}.csv.gz')
+        async with self.pool.acquire() as conn:
+            await conn.execute(f'''
+                INSERT INTO film_views_monthly (month, film_id, views, unique_viewers)
+                SELECT $1::date, v.film_id, COUNT(*), COUNT(DISTINCT v.user_id)
+                FROM {name} v
+                WHERE EXISTS (SELECT 1 FROM films f WHERE f.id = v.film_id)
+                GROUP BY v.film_id
+                ON CONFLICT (month, film_id) DO UPDATE
+                SET views = EXCLUDED.views, unique_viewers = EXCLUDED.unique_viewers
+            ''', month)
+
+            tmp_path = path + '.tmp'
+            with gzip.open(tmp_path, 'wb') as output:
+                await conn.copy_from_table(name, output=output, format='csv', header=True)
+            os.replace(tmp_path, path)
+
+            await conn.execute(f'DROP TABLE {name}')
+        return path
+    
+    async def archive_film_views_default(self, cutoff, archive_dir: str) -> Optional[str]:
+        """
+        film_views_default dagi cutoff dan eski ko'rishlarni arxivlash (partitsiyasi
+        allaqachon arxivlangan oylarga tushgan yozuvlar): rollup -> gzip CSV -> DELETE
+        film_views_monthly ga qo'shiladi (unique_viewers - pastki chegara)
+        Returns: arxiv fayli yo'li (arxivlanadigan yozuv bo'lmasa None)
+        """
+        async with self.pool.acquire() as conn:
+            bounds = await conn.fetchrow('''
+                SELECT MIN(viewed_date)::date AS first_day, MAX(viewed_date)::date AS last_day
+                FROM film_views_default WHERE viewed_date < $1
+            ''', cutoff)
+        if bounds['first_day'] is None:
+            return None
+
+        # Kunlik rollup yozuvlar hali film_views ichida turganda
+        await self.refresh_daily_stats(bounds['first_day'], bounds['last_day'])
+
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(
+            archive_dir, f'film_views_default_{cutoff:%Y%m}_{datetime.now():%Y%m%d%H%M%S}.csv.gz'
+        )
+        async with self.pool.acquire() as conn:
+            # Bitta snapshot: eksport qilingan va o'chirilgan yozuvlar bir xil
+            async with conn.transaction(isolation='repeatable_read'):
+                await conn.execute('''
+                    INSERT INTO film_views_monthly (month, film_id, views, unique_viewers)
+                    SELECT date_trunc('month', v.viewed_date)::date, v.film_id,
+                           COUNT(*), COUNT(DISTINCT v.user_id)
+                    FROM film_views_default v
+                    WHERE v.viewed_date < $1
+                      AND EXISTS (SELECT 1 FROM films f WHERE f.id = v.film_id)
+                    GROUP BY 1, 2
+                    ON CONFLICT (month, film_id) DO UPDATE
+                    SET views = film_views_monthly.views + EXCLUDED.views,
+                        unique_viewers = GREATEST(film_views_monthly.unique_viewers, EXCLUDED.unique_viewers)
+                ''', cutoff)
+
+                tmp_path = path + '.tmp'
+                with gzip.open(tmp_path, 'wb') as output:
+                    await conn.copy_from_query(
+                        'SELECT * FROM film_views_default WHERE viewed_date < $1', cutoff,
+                        output=output, format='csv', header=True
+                    )
+                os.replace(tmp_path, path)
+
+                await conn.execute('DELETE FROM film_views_default WHERE viewed_date < $1', cutoff)
+        return path
+    
+    @asynccontextmanager
+    async def maintenance_lock(self, lock_id: int):
+        """
+        Fon xizmati uchun advisory lock (workerlardan faqat bittasi bajaradi)
+        Lock olinmasa False - bu tikni boshqa worker bajaryapti
+        """
+        async with self.pool.acquire() as conn:
+            locked = await conn.fetchval('SELECT pg_try_advisory_lock($1)', lock_id)
+            try:
+                yield locked
+            finally:
+                if locked:
+                    await conn.execute('SELECT pg_advisory_unlock($1)', lock_id)
+    
     # =============== CHANNEL METHODS ===============
     
     async def add_channel(self, channel_id: int, channel_username: str = None, channel_title: str = None):
         """Kanal qo'shish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('''
                 INSERT INTO channels (channel_id, channel_username, channel_title)
                 VALUES ($1, $2, $3)
                 ON CONFLICT (channel_id) DO UPDATE
                 SET channel_username = $2, channel_title = $3
             ''', channel_id, channel_username, channel_title)
+        self._channels_cache = None
     
     async def delete_channel(self, channel_id: int):
         """Kanalni o'chirish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('DELETE FROM channels WHERE channel_id = $1', channel_id)
+        self._channels_cache = None
     
     async def get_all_channels(self):
-        """Barcha kanallarni olish"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetch('SELECT * FROM channels ORDER BY added_date')
+        """Barcha kanallarni olish (qisqa muddat keshlanadi)"""
+        if self._channels_cache is not None and time.monotonic() < self._channels_cache_expires:
+            return self._channels_cache
+        async with self._acquire() as conn:
+            channels = await conn.fetch('SELECT * FROM channels ORDER BY added_date')
+        self._channels_cache = channels
+        self._channels_cache_expires = time.monotonic() + config.CHANNELS_CACHE_TTL
+        return channels
+    
+    async def get_channel_memberships(self, user_id: int, channel_ids: List[int], max_age: int):
+        """Foydalanuvchining kanallardagi saqlangan a'zoliklari (max_age sekunddan yangi)"""
+        async with self._acquire() as conn:
+            return await conn.fetch('''
+                SELECT channel_id, is_member FROM channel_members
+                WHERE user_id = $1 AND channel_id = ANY($2::BIGINT[])
+                  AND updated_date >= NOW() - make_interval(secs => $3)
+            ''', user_id, channel_ids, max_age)
+    
+    async def upsert_channel_members(self, records: List[tuple]):
+        """(channel_id, user_id, is_member) yozuvlarini bitta so'rovda saqlash"""
+        if not records:
+            return
+        channel_ids, user_ids, flags = zip(*records)
+        async with self._acquire() as conn:
+            await conn.execute('''
+                INSERT INTO channel_members (channel_id, user_id, is_member)
+                SELECT * FROM UNNEST($1::BIGINT[], $2::BIGINT[], $3::BOOLEAN[])
+                ON CONFLICT (user_id, channel_id) DO UPDATE
+                SET is_member = EXCLUDED.is_member, updated_date = NOW()
+            ''', list(channel_ids), list(user_ids), list(flags))
     
     # =============== ADMIN METHODS ===============
     
+    async def start_acl(self):
+        """Adminlar ruxsatlarini xotiraga yuklash va o'zgarishlarni tinglash"""
+        await pg_listener.subscribe(ADMINS_CHANNEL, self._on_admins_changed, self.load_admins)
+        await self.load_admins()
+    
+    async def load_admins(self):
+        """admins jadvalini xotiradagi ruxsatlar xaritasiga yuklash"""
+        async with self._acquire() as conn:
+            rows = await conn.fetch('SELECT user_id, permissions FROM admins')
+        self._admins = {row['user_id']: list(row['permissions'] or []) for row in rows}
+    
+    async def _on_admins_changed(self, payload: str):
+        await self.load_admins()
+    
     async def add_admin(self, user_id: int, permissions: List[str], added_by: int):
         """Admin qo'shish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('''
                 INSERT INTO admins (user_id, permissions, added_by)
                 VALUES ($1, $2, $3)
                 ON CONFLICT (user_id) DO UPDATE
                 SET permissions = $2
             ''', user_id, permissions, added_by)
+            await pg_listener.notify(conn, ADMINS_CHANNEL, str(user_id))
+        if self._admins is not None:
+            self._admins[user_id] = list(permissions)
     
     async def get_admin(self, user_id: int):
         """Admin ma'lumotlarini olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetchrow('SELECT * FROM admins WHERE user_id = $1', user_id)
     
     async def get_all_admins(self):
         """Barcha adminlarni olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetch('SELECT * FROM admins')
     
     async def delete_admin(self, user_id: int):
         """Adminni o'chirish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('DELETE FROM admins WHERE user_id = $1', user_id)
+            await pg_listener.notify(conn, ADMINS_CHANNEL, str(user_id))
+        if self._admins is not None:
+            self._admins.pop(user_id, None)
+    
+    async def get_admin_permissions(self, user_id: int):
+        """Admin ruxsatlari ro'yxati (admin bo'lmasa None)"""
+        if self._admins is not None:
+            return self._admins.get(user_id)
+        admin = await self.get_admin(user_id)
+        return list(admin['permissions']) if admin else None
     
     async def is_admin(self, user_id: int):
         """Foydalanuvchi admin ekanligini tekshirish"""
         if user_id == config.OWNER_ID:
             return True
-        async with self.pool.acquire() as conn:
-            result = await conn.fetchval('SELECT COUNT(*) FROM admins WHERE user_id = $1', user_id)
-            return result > 0
+        return await self.get_admin_permissions(user_id) is not None
     
     async def has_permission(self, user_id: int, permission: str):
         """Admin ruxsatini tekshirish"""
         if user_id == config.OWNER_ID:
             return True
+        permissions = await self.get_admin_permissions(user_id)
+        if permissions and ('all' in permissions or '7' in permissions or permission in permissions):
+            return True
+        return False
+    
+    # =============== BROADCAST METHODS ===============
+    
+    async def create_broadcast_job(self, from_chat_id: int, message_id: int, created_by: int,
+                                   status_chat_id: int, status_message_id: int, total_count: int):
+        """Yangi broadcast job yaratish"""
+        async with self._acquire() as conn:
+            return await conn.fetchval('''
+                INSERT INTO broadcast_jobs
+                    (from_chat_id, message_id, created_by, status_chat_id, status_message_id, total_count)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING id
+            ''', from_chat_id, message_id, created_by, status_chat_id, status_message_id, total_count)
+    
+    async def get_broadcast_job(self, job_id: int):
+        """Broadcast job ma'lumotlarini olish"""
+        async with self._acquire() as conn:
+            return await conn.fetchrow('SELECT * FROM broadcast_jobs WHERE id = $1', job_id)
+    
+    async def get_broadcast_job_status(self, job_id: int):
+        """Broadcast job holatini olish"""
+        async with self._acquire() as conn:
+            return await conn.fetchval('SELECT status FROM broadcast_jobs WHERE id = $1', job_id)
+    
+    async def get_running_broadcast_jobs(self):
+        """Tugallanmagan (running) broadcast joblar"""
+        async with self._acquire() as conn:
+            return await conn.fetch('''
+                SELECT * FROM broadcast_jobs WHERE status = 'running' ORDER BY id
+            ''')
+    
+    async def update_broadcast_progress(self, job_id: int, cursor_user_id: int, success: int, failed: int):
+        """Job kursorini va hisoblagichlarini saqlash"""
+        async with self._acquire() as conn:
+            await conn.execute('''
+                UPDATE broadcast_jobs
+                SET cursor_user_id = $2, success_count = $3, failed_count = $4, updated_date = NOW()
+                WHERE id = $1
+            ''', job_id, cursor_user_id, success, failed)
+    
+    async def set_broadcast_job_status(self, job_id: int, status: str, expected: Optional[List[str]] = None):
+        """
+        Job holatini o'zgartirish
+        expected - faqat joriy holat shu ro'yxatda bo'lsa o'zgartiriladi
+        Returns: holat o'zgardimi
+        """
+        async with self._acquire() as conn:
+            result = await conn.execute('''
+                UPDATE broadcast_jobs
+                SET status = $2::VARCHAR, updated_date = NOW(),
+                    finished_date = CASE WHEN $2 IN ('done', 'cancelled') THEN NOW() ELSE finished_date END
+                WHERE id = $1 AND ($3::TEXT[] IS NULL OR status = ANY($3::TEXT[]))
+            ''', job_id, status, expected)
+            return result != 'UPDATE 0'
+    
+    @asynccontextmanager
+    async def broadcast_job_lock(self, job_id: int):
+        """
+        Job uchun advisory lock - bir vaqtda faqat bitta jarayon bajaradi
+        Ulanish uzilsa (crash) lock avtomatik bo'shaydi
+        """
+        # Sessiya darajasidagi lock - alohida ulanish kerak (update ulanishi emas)
         async with self.pool.acquire() as conn:
-            permissions = await conn.fetchval('SELECT permissions FROM admins WHERE user_id = $1', user_id)
-            if permissions and ('all' in permissions or '7' in permissions or permission in permissions):
-                return True
-            return False
+            locked = await conn.fetchval('SELECT pg_try_advisory_lock($1, $2)', BROADCAST_LOCK_NAMESPACE, job_id)
+            try:
+                yield locked
+            finally:
+                if locked:
+                    await conn.execute('SELECT pg_advisory_unlock($1, $2)', BROADCAST_LOCK_NAMESPACE, job_id)
     
     # =============== SETTINGS METHODS ===============
     
     async def get_setting(self, key: str):
         """Sozlamani olish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             return await conn.fetchval('SELECT value FROM settings WHERE key = $1', key)
     
     async def set_setting(self, key: str, value: str):
         """Sozlamani o'rnatish"""
-        async with self.pool.acquire() as conn:
+        async with self._acquire() as conn:
             await conn.execute('''
                 INSERT INTO settings (key, value)
                 VALUES ($1, $2)
                 ON CONFLICT (key) DO UPDATE
                 SET value = $2
             ''', key, value)
+            await pg_listener.notify(conn, SETTINGS_CHANNEL, key)
+    
+    # =============== UPDATE DEDUP METHODS ===============
+    
+    async def claim_update(self, update_id: int) -> bool:
+        """update_id ni band qilish. Boshqa worker allaqachon olgan bo'lsa False"""
+        async with self._acquire() as conn:
+            claimed = await conn.fetchval('''
+                INSERT INTO processed_updates (update_id) VALUES ($1)
+                ON CONFLICT (update_id) DO NOTHING
+                RETURNING update_id
+            ''', update_id)
+            return claimed is not None
+    
+    async def release_update(self, update_id: int):
+        """Qayta ishlanmagan update_id ni bo'shatish (Telegram qayta yuboradi)"""
+        async with self._acquire() as conn:
+            await conn.execute('DELETE FROM processed_updates WHERE update_id = $1', update_id)
+    
+    async def delete_old_processed_updates(self, max_age: int):
+        """max_age sekunddan eski update_id larni o'chirish"""
+        async with self._acquire() as conn:
+            result = await conn.execute(
+                'DELETE FROM processed_updates WHERE received_date < NOW() - make_interval(secs => $1)',
+                max_age
+            )
+            return int(result.split()[-1])
+    
+    # =============== FSM METHODS ===============
+    
+    async def get_fsm_record(self, key: str):
+        """FSM holati va ma'lumotlari (state, data)"""
+        async with self._acquire() as conn:
+            return await conn.fetchrow('SELECT state, data FROM fsm_states WHERE key = $1', key)
+    
+    async def set_fsm_state(self, key: str, state: Optional[str], notify_payload: str):
+        """FSM holatini saqlash. Returns: joriy data (JSON matn)"""
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                data = await conn.fetchval('''
+                    INSERT INTO fsm_states (key, state) VALUES ($1, $2)
+                    ON CONFLICT (key) DO UPDATE
+                    SET state = EXCLUDED.state, updated_date = NOW()
+                    RETURNING data
+                ''', key, state)
+                await pg_listener.notify(conn, FSM_CHANNEL, notify_payload)
+                return data
+    
+    async def set_fsm_data(self, key: str, data: str, notify_payload: str):
+        """FSM ma'lumotlarini (JSON matn) saqlash. Returns: joriy state"""
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                state = await conn.fetchval('''
+                    INSERT INTO fsm_states (key, data) VALUES ($1, $2::JSONB)
+                    ON CONFLICT (key) DO UPDATE
+                    SET data = EXCLUDED.data, updated_date = NOW()
+                    RETURNING state
+                ''', key, data)
+                await pg_listener.notify(conn, FSM_CHANNEL, notify_payload)
+                return state
+    
+    async def delete_fsm_state(self, key: str, notify_payload: str):
+        """FSM yozuvini o'chirish (holat va ma'lumotlar bo'sh)"""
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                result = await conn.execute('DELETE FROM fsm_states WHERE key = $1', key)
+                if result != 'DELETE 0':
+                    await pg_listener.notify(conn, FSM_CHANNEL, notify_payload)
+    
+    async def delete_stale_fsm_states(self, max_age: int):
+        """Tashlab ketilgan (max_age sekunddan eski) va bo'sh FSM yozuvlarini o'chirish"""
+        async with self._acquire() as conn:
+            result = await conn.execute('''
+                DELETE FROM fsm_states
+                WHERE updated_date < NOW() - make_interval(secs => $1)
+                   OR (state IS NULL AND data = '{}'::JSONB AND updated_date < NOW() - INTERVAL '1 minute')
+            ''', max_age)
+            return int(result.split()[-1])
+    
+    async def get_all_settings(self):
+        """Barcha sozlamalar"""
+        async with self._acquire() as conn:
+            return await conn.fetch('SELECT key, value FROM settings')
 
 
 # Global database instance
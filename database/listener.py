@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import asyncpg
+
+import config
+
+logger = logging.getLogger(__name__)
+
+NotifyHandler = Callable[[str], Awaitable[None]]
+ResetHandler = Callable[[], Awaitable[None]]
+
+
+class PgListener:
+    """
+    Postgres LISTEN/NOTIFY uchun bitta umumiy ulanish
+    Xotiradagi keshlar (katalog, adminlar, sozlamalar) shu orqali jarayonlar
+    orasida yangilanadi. Ulanish uzilsa qayta ulanadi va har bir obunachining
+    on_reset() i chaqiriladi - yo'qolgan xabarlar o'rniga to'liq qayta yuklash
+    """
+
+    def __init__(self):
+        self._conn: Optional[asyncpg.Connection] = None
+        self._handlers: Dict[str, Tuple[NotifyHandler, ResetHandler]] = {}
+        self._closing = False
+        self._tasks = set()
+
+    async def start(self):
+        self._closing = False
+        await self._connect()
+
+    async def stop(self):
+        self._closing = True
+        for task in list(self._tasks):
+            task.cancel()
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+    async def subscribe(self, channel: str, on_notify: NotifyHandler, on_reset: ResetHandler):
+        """Kanalga obuna bo'lish (start() dan oldin ham, keyin ham chaqirish mumkin)"""
+        self._handlers[channel] = (on_notify, on_reset)
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.add_listener(channel, self._on_notify)
+
+    async def notify(self, conn: asyncpg.Connection, channel: str, payload: str = ''):
+        """Berilgan ulanish orqali NOTIFY yuborish (tranzaksiya ichida bo'lsa commit da yetkaziladi)"""
+        await conn.execute('SELECT pg_notify($1, $2)', channel, payload)
+
+    async def _connect(self):
+        self._conn = await asyncpg.connect(config.DATABASE_URL)
+        for channel in self._handlers:
+            await self._conn.add_listener(channel, self._on_notify)
+        self._conn.add_termination_listener(self._on_terminate)
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        handler = self._handlers.get(channel)
+        if handler:
+            self._spawn(self._safe(handler[0](payload), channel))
+
+    async def _safe(self, coro, channel: str):
+        try:
+            await coro
+        except Exception as e:
+            logger.error(f"NOTIFY ({channel}) ni qayta ishlashda xatolik: {e}")
+
+    def _on_terminate(self, connection):
+        if self._closing:
+            return
+        logger.warning("LISTEN ulanishi uzildi, qayta ulanilmoqda...")
+        self._spawn(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 1
+        while not self._closing:
+            try:
+                await self._connect()
+                break
+            except Exception as e:
+                logger.error(f"LISTEN ulanishini tiklashda xatolik: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+        # Uzilish paytidagi xabarlar yo'qolgan - keshlarni to'liq yangilash
+        for channel, (_, on_reset) in list(self._handlers.items()):
+            await self._safe(on_reset(), channel)
+
+
+# Global listener
+pg_listener = PgListener()
@@ -0,0 +1,428 @@
+import logging
+from typing import Awaitable, Callable, List, Tuple
+
+import asyncpg
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Migratsiyalar bir vaqtda faqat bitta jarayonda bajarilishi uchun advisory lock
+MIGRATION_LOCK_ID = 7300
+
+MigrationFunc = Callable[[asyncpg.Connection], Awaitable[None]]
+MIGRATIONS: List[Tuple[int, str, MigrationFunc]] = []
+
+
+def migration(version: int, description: str):
+    """Migratsiyani ro'yxatga olish uchun dekorator (versiyalar o'sib boruvchi)"""
+    def decorator(func: MigrationFunc) -> MigrationFunc:
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    return max(version for version, _, _ in MIGRATIONS)
+
+
+async def get_schema_version(conn: asyncpg.Connection) -> int:
+    """Bazadagi sxema versiyasi (schema_version jadvali bo'lmasa 0)"""
+    if not await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL"):
+        return 0
+    return await conn.fetchval('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+
+
+async def run_migrations(conn: asyncpg.Connection) -> int:
+    """
+    Bajarilmagan migratsiyalarni tartib bilan, har birini alohida tranzaksiyada bajarish
+    Sxema allaqachon oxirgi versiyada bo'lsa hech qanday DDL bajarilmaydi
+    Returns: bajarilgan migratsiyalar soni
+    """
+    target = latest_version()
+    if await get_schema_version(conn) >= target:
+        return 0
+
+    await conn.execute('SELECT pg_advisory_lock($1)', MIGRATION_LOCK_ID)
+    try:
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_date TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        # Lock kutilayotganda boshqa jarayon migratsiya qilgan bo'lishi mumkin
+        current = await get_schema_version(conn)
+
+        applied = 0
+        for version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version <= current:
+                continue
+            async with conn.transaction():
+                await func(conn)
+                await conn.execute(
+                    'INSERT INTO schema_version (version, description) VALUES ($1, $2)',
+                    version, description
+                )
+            applied += 1
+            logger.info(f"Migratsiya bajarildi: {version:04d} - {description}")
+        return applied
+    finally:
+        await conn.execute('SELECT pg_advisory_unlock($1)', MIGRATION_LOCK_ID)
+
+
+async def _backfill_daily_stats(conn):
+    """daily_stats ni butun tarixdan to'ldirish (bir marta)"""
+    await conn.execute('''
+        INSERT INTO daily_stats (day, new_users)
+        SELECT joined_date::date, COUNT(*) FROM users
+        WHERE joined_date IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET new_users = EXCLUDED.new_users
+    ''')
+    await conn.execute('''
+        INSERT INTO daily_stats (day, views, unique_viewers)
+        SELECT viewed_date::date, COUNT(*), COUNT(DISTINCT user_id) FROM film_views
+        WHERE viewed_date IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT (day) DO UPDATE
+        SET views = EXCLUDED.views, unique_viewers = EXCLUDED.unique_viewers
+    ''')
+
+
+# =============== MIGRATIONS ===============
+
+@migration(1, "boshlang'ich sxema")
+async def initial_schema(conn: asyncpg.Connection):
+    # Users jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username VARCHAR(255),
+            full_name VARCHAR(255),
+            joined_date TIMESTAMP DEFAULT NOW(),
+            is_blocked BOOLEAN DEFAULT FALSE
+        )
+    ''')
+
+    # Films jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS films (
+            id SERIAL PRIMARY KEY,
+            code VARCHAR(50) UNIQUE NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            thumbnail_file_id VARCHAR(255),
+            created_date TIMESTAMP DEFAULT NOW()
+        )
+    ''')
+
+    # Film parts jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS film_parts (
+            id SERIAL PRIMARY KEY,
+            film_code VARCHAR(50) REFERENCES films(code) ON DELETE CASCADE,
+            part_number INTEGER NOT NULL,
+            video_file_id VARCHAR(255) NOT NULL,
+            added_date TIMESTAMP DEFAULT NOW(),
+            UNIQUE(film_code, part_number)
+        )
+    ''')
+
+    # Film views jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS film_views (
+            id SERIAL PRIMARY KEY,
+            film_code VARCHAR(50) REFERENCES films(code) ON DELETE CASCADE,
+            user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+            viewed_date TIMESTAMP DEFAULT NOW()
+        )
+    ''')
+
+    # Kino ko'rishlar hisoblagichi (get_top_films uchun, inkremental yangilanadi)
+    counts_exist = await conn.fetchval("SELECT to_regclass('film_view_counts') IS NOT NULL")
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS film_view_counts (
+            film_code VARCHAR(50) PRIMARY KEY REFERENCES films(code) ON DELETE CASCADE,
+            views_count BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    await conn.execute('''
+        CREATE INDEX IF NOT EXISTS film_view_counts_views_idx
+        ON film_view_counts (views_count DESC)
+    ''')
+    if not counts_exist:
+        # Birinchi marta - mavjud tarixdan to'ldirish
+        await conn.execute('''
+            INSERT INTO film_view_counts (film_code, views_count)
+            SELECT f.code, COUNT(fv.id)
+            FROM films f
+            LEFT JOIN film_views fv ON f.code = fv.film_code
+            GROUP BY f.code
+        ''')
+
+    # Kunlik statistika rollup jadvali (admin "User Statistic" uchun)
+    daily_exists = await conn.fetchval("SELECT to_regclass('daily_stats') IS NOT NULL")
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day DATE PRIMARY KEY,
+            new_users INTEGER NOT NULL DEFAULT 0,
+            views INTEGER NOT NULL DEFAULT 0,
+            unique_viewers INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    if not daily_exists:
+        await _backfill_daily_stats(conn)
+
+    # Channels jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            id SERIAL PRIMARY KEY,
+            channel_id BIGINT UNIQUE NOT NULL,
+            channel_username VARCHAR(255),
+            channel_title VARCHAR(255),
+            added_date TIMESTAMP DEFAULT NOW()
+        )
+    ''')
+
+    # Kanal a'zolari indeksi (chat_member yangilanishlaridan)
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS channel_members (
+            channel_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            is_member BOOLEAN NOT NULL,
+            updated_date TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (user_id, channel_id)
+        )
+    ''')
+
+    # Admins jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            user_id BIGINT PRIMARY KEY,
+            permissions TEXT[] DEFAULT ARRAY[]::TEXT[],
+            added_by BIGINT,
+            added_date TIMESTAMP DEFAULT NOW()
+        )
+    ''')
+
+    # Settings jadvali
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key VARCHAR(255) PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+    # Broadcast joblari (qayta tiklanadigan xabar tarqatish)
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id SERIAL PRIMARY KEY,
+            from_chat_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            status_chat_id BIGINT,
+            status_message_id BIGINT,
+            created_by BIGINT,
+            status VARCHAR(20) DEFAULT 'running',
+            cursor_user_id BIGINT DEFAULT 0,
+            success_count INTEGER DEFAULT 0,
+            failed_count INTEGER DEFAULT 0,
+            total_count INTEGER DEFAULT 0,
+            created_date TIMESTAMP DEFAULT NOW(),
+            updated_date TIMESTAMP DEFAULT NOW(),
+            finished_date TIMESTAMP
+        )
+    ''')
+
+    # Admin contact link ni sozlamalarga qo'shish
+    await conn.execute('''
+        INSERT INTO settings (key, value)
+        VALUES ('admin_contact_link', $1)
+        ON CONFLICT (key) DO NOTHING
+    ''', config.ADMIN_CONTACT_LINK)
+
+
+@migration(2, "so'rovlar uchun indekslar")
+async def query_indexes(conn: asyncpg.Connection):
+    # Ko'rishlar: kino bo'yicha (top/kaskad o'chirish) va sana bo'yicha (kunlik rollup)
+    await conn.execute('CREATE INDEX IF NOT EXISTS film_views_film_code_idx ON film_views (film_code)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS film_views_viewed_date_idx ON film_views (viewed_date)')
+    # daily_stats rollup (kunlik yangi foydalanuvchilar)
+    await conn.execute('CREATE INDEX IF NOT EXISTS users_joined_date_idx ON users (joined_date)')
+    # Kinolar ro'yxati (ORDER BY created_date DESC)
+    await conn.execute('CREATE INDEX IF NOT EXISTS films_created_date_idx ON films (created_date DESC)')
+
+
+@migration(3, "kinolar keyset sahifalash indeksi")
+async def films_keyset_index(conn: asyncpg.Connection):
+    # get_films_page: ORDER BY created_date DESC, id DESC
+    await conn.execute('CREATE INDEX IF NOT EXISTS films_created_date_id_idx ON films (created_date DESC, id DESC)')
+    await conn.execute('DROP INDEX IF EXISTS films_created_date_idx')
+
+
+@migration(4, "FSM holatlari jadvali")
+async def fsm_states(conn: asyncpg.Connection):
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data JSONB NOT NULL DEFAULT '{}'::JSONB,
+            updated_date TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    ''')
+    # TTL bo'yicha tozalash uchun
+    await conn.execute('CREATE INDEX IF NOT EXISTS fsm_states_updated_date_idx ON fsm_states (updated_date)')
+
+
+@migration(5, "qayta ishlangan update_id lar (workerlar orasida dublikatlarni aniqlash)")
+async def processed_updates(conn: asyncpg.Connection):
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS processed_updates (
+            update_id BIGINT PRIMARY KEY,
+            received_date TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS processed_updates_received_date_idx ON processed_updates (received_date)')
+
+
+@migration(6, "films.parts_count - trigger bilan yuritiladigan qismlar soni")
+async def films_parts_count(conn: asyncpg.Connection):
+    await conn.execute('ALTER TABLE films ADD COLUMN IF NOT EXISTS parts_count INTEGER NOT NULL DEFAULT 0')
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION film_parts_count_trg() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE films SET parts_count = parts_count + 1 WHERE code = NEW.film_code;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE films SET parts_count = parts_count - 1 WHERE code = OLD.film_code;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    await conn.execute('DROP TRIGGER IF EXISTS film_parts_count ON film_parts')
+    await conn.execute('''
+        CREATE TRIGGER film_parts_count
+        AFTER INSERT OR DELETE OR UPDATE OF film_code ON film_parts
+        FOR EACH ROW EXECUTE FUNCTION film_parts_count_trg()
+    ''')
+    # Mavjud qismlar bo'yicha boshlang'ich qiymat
+    await conn.execute('''
+        UPDATE films f SET parts_count = p.cnt
+        FROM (SELECT film_code, COUNT(*) AS cnt FROM film_parts GROUP BY film_code) p
+        WHERE f.code = p.film_code
+    ''')
+
+
+@migration(7, "film_parts / film_views / film_view_counts: film_code o'rniga butun son film_id")
+async def film_id_keys(conn: asyncpg.Connection):
+    # parts_count trigger i film_code ustuniga bog'langan - ustun o'chirilishidan oldin
+    await conn.execute('DROP TRIGGER IF EXISTS film_parts_count ON film_parts')
+
+    for table in ('film_parts', 'film_views', 'film_view_counts'):
+        await conn.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS film_id INTEGER')
+        await conn.execute(f'''
+            UPDATE {table} t SET film_id = f.id
+            FROM films f
+            WHERE f.code = t.film_code AND t.film_id IS NULL
+        ''')
+        # Kinosi yo'q (film_code NULL) yozuvlar
+        await conn.execute(f'DELETE FROM {table} WHERE film_id IS NULL')
+        await conn.execute(f'ALTER TABLE {table} ALTER COLUMN film_id SET NOT NULL')
+        await conn.execute(f'''
+            ALTER TABLE {table} ADD CONSTRAINT {table}_film_id_fkey
+            FOREIGN KEY (film_id) REFERENCES films(id) ON DELETE CASCADE
+        ''')
+        # film_code bilan bog'liq indekslar va cheklovlar ham o'chadi
+        await conn.execute(f'ALTER TABLE {table} DROP COLUMN film_code')
+
+    await conn.execute('ALTER TABLE film_parts ADD CONSTRAINT film_parts_film_id_part_number_key UNIQUE (film_id, part_number)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS film_views_film_id_idx ON film_views (film_id)')
+    await conn.execute('ALTER TABLE film_view_counts ADD PRIMARY KEY (film_id)')
+
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION film_parts_count_trg() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE films SET parts_count = parts_count + 1 WHERE id = NEW.film_id;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE films SET parts_count = parts_count - 1 WHERE id = OLD.film_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    await conn.execute('''
+        CREATE TRIGGER film_parts_count
+        AFTER INSERT OR DELETE OR UPDATE OF film_id ON film_parts
+        FOR EACH ROW EXECUTE FUNCTION film_parts_count_trg()
+    ''')
+
+
+@migration(8, "film_views: oylik partitsiyalar, BRIN indeks, oylik rollup")
+async def film_views_partitioning(conn: asyncpg.Connection):
+    # Oy uchun partitsiya (mavjud bo'lmasa) - runtime da ham oldindan yaratiladi
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION ensure_film_views_partition(d DATE) RETURNS TEXT AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', d)::date;
+            part_name TEXT := 'film_views_p' || to_char(month_start, 'YYYYMM');
+        BEGIN
+            IF to_regclass(part_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF film_views FOR VALUES FROM (%L) TO (%L)',
+                    part_name, month_start, (month_start + INTERVAL '1 month')::date
+                );
+            END IF;
+            RETURN part_name;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    await conn.execute('ALTER TABLE film_views RENAME TO film_views_old')
+    await conn.execute('ALTER SEQUENCE film_views_id_seq OWNED BY NONE')
+    # Partitsiyalangan jadvalda PRIMARY KEY partitsiya kalitini o'z ichiga olishi kerak -
+    # id ga hech narsa bog'lanmagan, shuning uchun PK siz
+    await conn.execute('''
+        CREATE TABLE film_views (
+            id BIGINT NOT NULL DEFAULT nextval('film_views_id_seq'),
+            film_id INTEGER NOT NULL REFERENCES films(id) ON DELETE CASCADE,
+            user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+            viewed_date TIMESTAMP NOT NULL DEFAULT NOW()
+        ) PARTITION BY RANGE (viewed_date)
+    ''')
+    await conn.execute('ALTER SEQUENCE film_views_id_seq OWNED BY film_views.id')
+    # Oylik partitsiyalarga tushmagan yozuvlar uchun
+    await conn.execute('CREATE TABLE film_views_default PARTITION OF film_views DEFAULT')
+    await conn.execute('''
+        SELECT ensure_film_views_partition(m::date)
+        FROM generate_series(
+            date_trunc('month', COALESCE((SELECT MIN(viewed_date) FROM film_views_old), NOW())),
+            NOW() + INTERVAL '2 months',
+            INTERVAL '1 month'
+        ) AS m
+    ''')
+    await conn.execute('''
+        INSERT INTO film_views (id, film_id, user_id, viewed_date)
+        SELECT id, film_id, user_id, COALESCE(viewed_date, NOW()) FROM film_views_old
+    ''')
+    await conn.execute('DROP TABLE film_views_old')
+
+    # Vaqt bo'yicha ketma-ket yoziladigan jadval uchun BRIN (btree dan ancha kichik)
+    await conn.execute('CREATE INDEX film_views_viewed_date_brin ON film_views USING BRIN (viewed_date)')
+    # Kaskad o'chirish (kino o'chirilganda)
+    await conn.execute('CREATE INDEX film_views_film_id_idx ON film_views (film_id)')
+
+    # Arxivlangan oylar bo'yicha kinolar statistikasi
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS film_views_monthly (
+            month DATE NOT NULL,
+            film_id INTEGER NOT NULL REFERENCES films(id) ON DELETE CASCADE,
+            views BIGINT NOT NULL DEFAULT 0,
+            unique_viewers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, film_id)
+        )
+    ''')
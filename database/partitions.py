@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+import config
+from database.db import db, FILM_VIEWS_MAINTENANCE_LOCK_ID
+
+logger = logging.getLogger(__name__)
+
+
+class FilmViewsPartitionManager:
+    """
+    film_views oylik partitsiyalariga xizmat ko'rsatuvchi fon job
+    Oldindan keyingi oylar partitsiyalarini yaratadi; retention dan eski oylarni
+    rollupga yig'ib, gzip CSV ga eksport qiladi va o'chiradi
+    """
+
+    def __init__(
+        self,
+        retention_months: int = config.FILM_VIEWS_RETENTION_MONTHS,
+        archive_dir: str = config.FILM_VIEWS_ARCHIVE_DIR,
+        interval: float = config.FILM_VIEWS_MAINTENANCE_INTERVAL
+    ):
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self._task = None
+
+    def _cutoff(self):
+        """Shu oydan oldingi oylar arxivlanadi"""
+        today = datetime.now().date()
+        months = today.year * 12 + today.month - 1 - self.retention_months
+        return today.replace(year=months // 12, month=months % 12 + 1, day=1)
+
+    async def run(self):
+        # WEB_WORKERS > 1: har bir tikda faqat bitta worker
+        async with db.maintenance_lock(FILM_VIEWS_MAINTENANCE_LOCK_ID) as locked:
+            if locked:
+                await self._maintain()
+
+    async def _maintain(self):
+        await db.ensure_film_views_partitions()
+        if self.retention_months <= 0:
+            return
+        # Arxiv - ko'rishlar tarixining yagona nusxasi: vaqtinchalik (nisbiy) papkaga yozilmaydi
+        if not self.archive_dir or not os.path.isabs(self.archive_dir):
+            logger.error(
+                "FILM_VIEWS_RETENTION_MONTHS yoqilgan, lekin FILM_VIEWS_ARCHIVE_DIR doimiy diskdagi "
+                "absolyut yo'l emas - film_views arxivlanmaydi"
+            )
+            return
+
+        cutoff = self._cutoff()
+        for name, month, attached in await db.get_film_views_partitions():
+            if month >= cutoff:
+                break
+            path = await db.archive_film_views_partition(name, month, attached, self.archive_dir)
+            logger.info(f"film_views {month:%Y-%m} arxivlandi: {path}")
+
+        # Arxivlangan oylarga kechikib yozilib, default partitsiyaga tushgan ko'rishlar
+        path = await db.archive_film_views_default(cutoff, self.archive_dir)
+        if path:
+            logger.info(f"film_views_default dagi {cutoff:%Y-%m} gacha ko'rishlar arxivlandi: {path}")
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"film_views partitsiyalariga xizmat ko'rsatishda xatolik: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Global partitsiyalar menejeri
+film_view_partitions = FilmViewsPartitionManager()
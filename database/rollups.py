@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import config
+from database.db import db, DAILY_STATS_LOCK_ID
+
+logger = logging.getLogger(__name__)
+
+
+class DailyStatsRollup:
+    """
+    daily_stats jadvalini fonda yangilab turuvchi job
+    Har safar faqat bugun va kecha qayta hisoblanadi - eski kunlar o'zgarmaydi
+    """
+
+    def __init__(self, interval: float = config.DAILY_STATS_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    async def refresh(self):
+        # WEB_WORKERS > 1: har bir tikda faqat bitta worker qayta hisoblaydi
+        async with db.maintenance_lock(DAILY_STATS_LOCK_ID) as locked:
+            if not locked:
+                return
+            today = datetime.now().date()
+            await db.refresh_daily_stats(today - timedelta(days=1), today)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"daily_stats ni yangilashda xatolik: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Global rollup job
+daily_stats = DailyStatsRollup()
@@ -0,0 +1,93 @@
+import logging
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import config
+from database.db import db, SETTINGS_CHANNEL
+from database.listener import pg_listener
+
+logger = logging.getLogger(__name__)
+
+
+class SettingSpec(NamedTuple):
+    """Sozlama ta'rifi: qiymat turi (matndan o'giruvchi), standart qiymat va tekshiruvchi"""
+    type: Callable[[str], Any]
+    default: Any
+    validator: Optional[Callable[[Any], bool]] = None
+
+
+def positive(value) -> bool:
+    """Musbat son (0 ga bo'lish / 0 ta worker bo'lmasligi uchun)"""
+    return value > 0
+
+
+class SettingsRegistry:
+    """
+    settings jadvalining xotiradagi, turlangan nusxasi
+    Sozlamani o'qish - oddiy lug'atdan olish; set() va boshqa jarayonlardagi
+    o'zgarishlar LISTEN/NOTIFY orqali yetib keladi
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, SettingSpec] = {}
+        self._values: Dict[str, Any] = {}
+
+    def register(self, key: str, type: Callable[[str], Any] = str, default: Any = None,
+                 validator: Optional[Callable[[Any], bool]] = None):
+        """Yangi sozlamani ro'yxatga olish"""
+        self._specs[key] = SettingSpec(type, default, validator)
+
+    def get(self, key: str) -> Any:
+        """Sozlama qiymati (bazada bo'lmasa - standart qiymat)"""
+        if key in self._values:
+            return self._values[key]
+        spec = self._specs.get(key)
+        return spec.default if spec else None
+
+    async def set(self, key: str, value: Any):
+        """
+        Sozlamani saqlash (barcha jarayonlarga tarqatiladi)
+        Qiymat turga o'tmasa yoki tekshiruvdan o'tmasa - ValueError, bazaga yozilmaydi
+        """
+        self._parse(key, str(value))
+        await db.set_setting(key, str(value))
+        self._apply(key, str(value))
+
+    async def start(self):
+        await pg_listener.subscribe(SETTINGS_CHANNEL, self.refresh, self.load)
+        await self.load()
+
+    async def load(self):
+        """Barcha sozlamalarni bazadan qayta yuklash"""
+        rows = await db.get_all_settings()
+        self._values = {}
+        for row in rows:
+            self._apply(row['key'], row['value'])
+
+    async def refresh(self, key: str):
+        """Bitta sozlamani bazadan qayta o'qish"""
+        value = await db.get_setting(key)
+        if value is None:
+            self._values.pop(key, None)
+        else:
+            self._apply(key, value)
+
+    def _parse(self, key: str, raw: str) -> Any:
+        spec = self._specs.get(key, SettingSpec(str, None))
+        value = spec.type(raw)
+        if spec.validator is not None and not spec.validator(value):
+            raise ValueError(f"{key} uchun ruxsat etilmagan qiymat: {raw!r}")
+        return value
+
+    def _apply(self, key: str, raw: str):
+        try:
+            self._values[key] = self._parse(key, raw)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Sozlama noto'g'ri: {key}={raw!r} ({e}), standart qiymat ishlatiladi")
+            self._values.pop(key, None)
+
+
+# Global sozlamalar
+settings = SettingsRegistry()
+settings.register('admin_contact_link', str, config.ADMIN_CONTACT_LINK)
+settings.register('broadcast_rate', float, config.BROADCAST_RATE, positive)
+settings.register('broadcast_concurrency', int, config.BROADCAST_CONCURRENCY, positive)
@@ -0,0 +1,124 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+import config
+from database.db import db, FSM_CHANNEL
+from database.listener import pg_listener
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresStorage(BaseStorage):
+    """
+    aiogram FSM holatlarini Postgres (fsm_states) da saqlash - har qanday worker
+    istalgan yangilanishni qayta ishlay oladi
+    O'qishlar lokal keshdan; boshqa jarayon yozsa NOTIFY orqali kesh tozalanadi
+    Tashlab ketilgan holatlar FSM_STATE_TTL dan keyin o'chiriladi
+    """
+
+    def __init__(
+        self,
+        state_ttl: int = config.FSM_STATE_TTL,
+        cache_ttl: int = config.FSM_CACHE_TTL,
+        cleanup_interval: float = 600.0
+    ):
+        self.state_ttl = state_ttl
+        self.cache_ttl = cache_ttl
+        self.cleanup_interval = cleanup_interval
+        self._cache = TTLCache(maxsize=100_000)
+        # O'zimiz yuborgan NOTIFY larni ajratish uchun
+        self._token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._task = None
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            key.business_connection_id, key.destiny
+        ))
+
+    async def start(self):
+        await pg_listener.subscribe(FSM_CHANNEL, self._on_notify, self._on_reset)
+        if self._task is None:
+            self._task = asyncio.create_task(self._cleanup_loop())
+
+    async def _on_notify(self, payload: str):
+        token, _, key = payload.partition(" ")
+        if token != self._token:
+            self._cache.delete(key)
+
+    async def _on_reset(self):
+        self._cache.clear()
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                deleted = await db.delete_stale_fsm_states(self.state_ttl)
+                if deleted:
+                    logger.info(f"{deleted} ta eski FSM holati o'chirildi")
+            except Exception as e:
+                logger.error(f"FSM holatlarini tozalashda xatolik: {e}")
+
+    async def _load(self, key: str):
+        """(state, data) - avval keshdan, keyin bazadan"""
+        record = self._cache.get(key)
+        if record is not None:
+            return record
+        row = await db.get_fsm_record(key)
+        record = (row['state'], json.loads(row['data'])) if row else (None, {})
+        self._cache.set(key, record, self.cache_ttl)
+        return record
+
+    async def _delete(self, key: str):
+        """Bo'sh holat - yozuv bazada saqlanmaydi"""
+        await db.delete_fsm_state(key, f"{self._token} {key}")
+        self._cache.set(key, (None, {}), self.cache_ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self._key(key)
+        value = state.state if isinstance(state, State) else state
+        current_state, current_data = await self._load(k)
+        # O'zgarish yo'q (masalan bo'sh holatda state.clear()) - yozuv ham, NOTIFY ham yo'q
+        if current_state == value:
+            return
+        if value is None and not current_data:
+            await self._delete(k)
+            return
+        data = await db.set_fsm_state(k, value, f"{self._token} {k}")
+        self._cache.set(k, (value, json.loads(data)), self.cache_ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self._key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        k = self._key(key)
+        current_state, current_data = await self._load(k)
+        if current_data == data:
+            return
+        if not data and current_state is None:
+            await self._delete(k)
+            return
+        data = copy.deepcopy(data)
+        state = await db.set_fsm_data(k, json.dumps(data), f"{self._token} {k}")
+        self._cache.set(k, (state, data), self.cache_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self._key(key))
+        return copy.deepcopy(data)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
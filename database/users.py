@@ -0,0 +1,43 @@
+import logging
+from typing import Dict, Optional
+
+import config
+from database.db import db
+from utils.batching import BatchWriter
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class UserRegistry(BatchWriter):
+    """
+    Ma'lum foydalanuvchilar va ularning oxirgi profili (username, full_name)
+    Faqat yangi yoki profili o'zgargan foydalanuvchilar to'plab bazaga yoziladi
+    """
+
+    name = "users"
+
+    def __init__(self, flush_interval: float = 3.0, max_pending: int = 500):
+        super().__init__(flush_interval=flush_interval, max_pending=max_pending)
+        self._known = TTLCache(maxsize=config.USER_CACHE_SIZE)
+
+    def touch(self, user_id: int, username: Optional[str], full_name: Optional[str]) -> bool:
+        """
+        Foydalanuvchini qayd qilish
+        Returns: yozuv navbatga qo'shildimi (yangi yoki o'zgargan profil)
+        """
+        profile = (username, full_name)
+        if self._known.get(user_id) == profile:
+            return False
+        self._known.set(user_id, profile, config.USER_CACHE_TTL)
+        self.put(user_id, profile)
+        return True
+
+    async def write(self, items: Dict[int, tuple]):
+        await db.upsert_users([
+            (user_id, username, full_name) for user_id, (username, full_name) in items.items()
+        ])
+
+
+# Global foydalanuvchilar registri
+user_registry = UserRegistry()
@@ -0,0 +1,37 @@
+import itertools
+import logging
+from datetime import datetime
+from typing import Dict
+
+from database.db import db
+from database.users import user_registry
+from utils.batching import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+
+class FilmViewBuffer(BatchWriter):
+    """
+    Kino ko'rishlarini xotirada yig'ib, to'plab yozish (write-behind)
+    Ko'rishni qayd qilish javobga hech qanday kechikish qo'shmaydi
+    """
+
+    name = "film_views"
+
+    def __init__(self, flush_interval: float = 2.0, max_pending: int = 1000):
+        super().__init__(flush_interval=flush_interval, max_pending=max_pending)
+        self._seq = itertools.count()
+
+    def record(self, film_code: str, user_id: int):
+        """Kino ko'rilganini qayd qilish (vaqt hozirgi paytda olinadi)"""
+        self.put(next(self._seq), (film_code, user_id, datetime.now()))
+
+    async def write(self, items: Dict[int, tuple]):
+        # Shu workerdagi yangi foydalanuvchilar to'liq profil bilan yozilsin (boshqa
+        # workerlardagilar uchun add_film_views minimal users yozuvini yaratadi)
+        await user_registry.flush()
+        await db.add_film_views(list(items.values()))
+
+
+# Global ko'rishlar buferi
+view_buffer = FilmViewBuffer()
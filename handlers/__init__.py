@@ -1,3 +1,3 @@
-from . import user, admin, admin_stats, admin_management
+from . import user, admin, admin_stats, admin_management, channel_events
 
-__all__ = ['user', 'admin', 'admin_stats', 'admin_management']
+__all__ = ['user', 'admin', 'admin_stats', 'admin_management', 'channel_events']
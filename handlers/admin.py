@@ -63,8 +63,7 @@ async def admin_panel(message: Message, state: FSMContext):
     if message.from_user.id == config.OWNER_ID:
         permissions = None  # Owner barcha ruxsatlarga ega
     else:
-        admin_data = await db.get_admin(message.from_user.id)
-        permissions = admin_data['permissions'] if admin_data else []
+        permissions = await db.get_admin_permissions(message.from_user.id) or []
     
     await message.answer(
         f"👨‍💼 <b>Admin Panel</b>\n\n"
@@ -227,8 +226,8 @@ async def add_parts_code(message: Message, state: FSMContext):
         )
         return
     
-    # Hozirgi qismlar sonini olish
-    parts_count = await db.get_parts_count(film_code)
+    # Hozirgi qismlar soni (films.parts_count)
+    parts_count = film['parts_count']
     
     await state.update_data(film_code=film_code, current_part=parts_count + 1)
     await state.set_state(AdminStates.waiting_parts_videos)
@@ -271,9 +270,8 @@ async def finish_adding_parts(message: Message, state: FSMContext):
     """Qismlar qo'shishni yakunlash"""
     data = await state.get_data()
     film_code = data['film_code']
-    added_parts = data['current_part'] - await db.get_parts_count(film_code) - 1
-    
-    total_parts = await db.get_parts_count(film_code)
+    film = await db.get_film(film_code)
+    total_parts = film['parts_count'] if film else 0
     
     await state.clear()
     await message.answer(
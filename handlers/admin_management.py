@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 
 import config
 from database.db import db
+from database.settings import settings
 from utils.keyboards import get_admin_main_menu, get_cancel_keyboard
 from utils.helpers import parse_permissions, get_permission_name
 from handlers.admin import AdminStates, is_admin_check, has_permission_check
@@ -200,7 +201,7 @@ async def set_admin_contact(message: Message):
             "📝 <b>Admin contact link ni o'zgartirish</b>\n\n"
             "Format: <code>/set_admin_contact https://t.me/username</code>\n\n"
             "Hozirgi link:\n"
-            f"{await db.get_setting('admin_contact_link')}"
+            f"{settings.get('admin_contact_link')}"
         )
         return
     
@@ -211,7 +212,7 @@ async def set_admin_contact(message: Message):
         await message.answer("❌ Link http:// yoki https:// bilan boshlanishi kerak!")
         return
     
-    await db.set_setting('admin_contact_link', new_link)
+    await settings.set('admin_contact_link', new_link)
     
     await message.answer(
         f"✅ <b>Admin contact link yangilandi!</b>\n\n"
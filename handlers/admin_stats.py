@@ -1,14 +1,20 @@
 from aiogram import Router, F
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
 
 from database.db import db
+from database.catalog import catalog
 from utils.keyboards import (
     get_admin_main_menu, get_cancel_keyboard,
-    get_channel_management_keyboard, get_pagination_keyboard
+    get_channel_management_keyboard, get_pagination_keyboard,
+    get_broadcast_control_keyboard
 )
-from utils.helpers import format_number, broadcast_message, parse_permissions
+from utils.helpers import (
+    format_number, parse_permissions,
+    encode_page_cursor, decode_page_cursor
+)
+from utils.broadcast_jobs import broadcast_jobs
 from handlers.admin import AdminStates, is_admin_check, has_permission_check
 
 router = Router()
@@ -23,19 +29,16 @@ async def user_statistics(message: Message):
         await message.answer("❌ Sizda bu amalni bajarish uchun ruxsat yo'q!")
         return
     
-    # Ma'lumotlarni yig'ish
-    total_users = await db.get_users_count()
-    daily_users = await db.get_users_by_period(1)
-    weekly_users = await db.get_users_by_period(7)
-    monthly_users = await db.get_users_by_period(30)
-    daily_views = await db.get_daily_views()
+    # Ma'lumotlarni yig'ish (daily_stats rollupdan, bitta so'rov)
+    stats = await db.get_user_statistics()
     
     text = "👥 <b>Foydalanuvchilar statistikasi</b>\n\n"
-    text += f"📊 Jami foydalanuvchilar: <b>{format_number(total_users)}</b>\n\n"
-    text += f"📅 Bugun qo'shildi: <b>{format_number(daily_users)}</b>\n"
-    text += f"📅 1 hafta ichida: <b>{format_number(weekly_users)}</b>\n"
-    text += f"📅 1 oy ichida: <b>{format_number(monthly_users)}</b>\n\n"
-    text += f"👁 Bugun ko'rildi: <b>{format_number(daily_views)}</b> ta kino\n"
+    text += f"📊 Jami foydalanuvchilar: <b>{format_number(stats['total'])}</b>\n\n"
+    text += f"📅 Bugun qo'shildi: <b>{format_number(stats['daily'])}</b>\n"
+    text += f"📅 1 hafta ichida: <b>{format_number(stats['weekly'])}</b>\n"
+    text += f"📅 1 oy ichida: <b>{format_number(stats['monthly'])}</b>\n\n"
+    text += f"👁 Bugun ko'rildi: <b>{format_number(stats['daily_views'])}</b> ta kino\n"
+    text += f"👤 Bugun ko'rganlar: <b>{format_number(stats['daily_viewers'])}</b> ta foydalanuvchi\n"
     
     await message.answer(text, reply_markup=get_admin_main_menu())
 
@@ -53,50 +56,74 @@ async def film_statistics(message: Message, state: FSMContext):
     await show_films_page(message, 0)
 
 
-async def show_films_page(message: Message, page: int = 0):
-    """Kinolar ro'yxatini sahifalab ko'rsatish"""
-    films, total = await db.get_films_paginated(offset=page * 30, limit=30)
+FILMS_PER_PAGE = 30
+
+
+async def build_films_page(page: int = 0, cursor: tuple = None, direction: str = 'next'):
+    """
+    Kinolar sahifasi matni va klaviaturasi
+    Returns: (text, keyboard), kinolar bo'lmasa (None, None)
+    """
+    # Birinchi sahifa har doim kursorsiz olinadi
+    if page == 0:
+        cursor = None
+    films = await db.get_films_page(cursor, direction, limit=FILMS_PER_PAGE)
     
     if not films:
-        await message.answer(
-            "📊 Hozircha kinolar yo'q!",
-            reply_markup=get_admin_main_menu()
-        )
-        return
+        return None, None
     
-    total_pages = (total + 29) // 30  # Round up
+    total = await catalog.get_films_count()
+    total_pages = max(page + 1, (total + FILMS_PER_PAGE - 1) // FILMS_PER_PAGE)  # Round up
     
     text = f"🎞 <b>Kinolar ro'yxati</b>\n"
     text += f"📄 Sahifa {page + 1}/{total_pages}\n"
     text += f"📊 Jami: {total} ta kino\n\n"
     
-    for idx, film in enumerate(films, start=page * 30 + 1):
+    for idx, film in enumerate(films, start=page * FILMS_PER_PAGE + 1):
         text += f"{idx}. <b>{film['name']}</b>\n"
         text += f"   🔢 Kod: <code>{film['code']}</code>\n\n"
     
-    # Pagination keyboard
-    keyboard = get_pagination_keyboard(page, total_pages, "films")
+    # Pagination keyboard (keyset kursorlar callback_data ichida)
+    keyboard = get_pagination_keyboard(
+        page, total_pages, "films",
+        prev_cursor=encode_page_cursor(films[0]),
+        next_cursor=encode_page_cursor(films[-1])
+    )
+    return text, keyboard
+
+
+async def show_films_page(message: Message, page: int = 0):
+    """Kinolar ro'yxatini sahifalab ko'rsatish"""
+    text, keyboard = await build_films_page(page)
+    
+    if not text:
+        await message.answer(
+            "📊 Hozircha kinolar yo'q!",
+            reply_markup=get_admin_main_menu()
+        )
+        return
     
     await message.answer(text, reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("films_page_"))
-async def films_page_callback(callback: Message):
+async def films_page_callback(callback: CallbackQuery):
     """Sahifa o'zgarganda"""
-    page = int(callback.data.split("_")[-1])
+    # films_page_PAGE_DIRECTION_CREATED_ID (eski xabarlarda: films_page_PAGE)
+    parts = callback.data.split("_")
+    page = int(parts[2])
     
-    films, total = await db.get_films_paginated(offset=page * 30, limit=30)
-    total_pages = (total + 29) // 30
-    
-    text = f"🎞 <b>Kinolar ro'yxati</b>\n"
-    text += f"📄 Sahifa {page + 1}/{total_pages}\n"
-    text += f"📊 Jami: {total} ta kino\n\n"
+    if len(parts) == 6:
+        direction = 'prev' if parts[3] == 'p' else 'next'
+        cursor = decode_page_cursor(parts[4], parts[5])
+    else:
+        page, direction, cursor = 0, 'next', None
     
-    for idx, film in enumerate(films, start=page * 30 + 1):
-        text += f"{idx}. <b>{film['name']}</b>\n"
-        text += f"   🔢 Kod: <code>{film['code']}</code>\n\n"
+    text, keyboard = await build_films_page(page, cursor, direction)
     
-    keyboard = get_pagination_keyboard(page, total_pages, "films")
+    if not text:
+        await callback.answer("📊 Hozircha kinolar yo'q!", show_alert=True)
+        return
     
     await callback.message.edit_text(text, reply_markup=keyboard)
     await callback.answer()
@@ -307,19 +334,54 @@ async def broadcast_process(message: Message, state: FSMContext):
     
     # Yuborilmoqda xabari
     status_msg = await message.answer("📤 Xabar yuborilmoqda...")
-    
-    # Broadcast
-    success, failed = await broadcast_message(message.bot, message)
-    
+
     await state.clear()
-    
-    await status_msg.edit_text(
-        f"✅ <b>Xabar yuborildi!</b>\n\n"
-        f"✅ Muvaffaqiyatli: {format_number(success)}\n"
-        f"❌ Xatolik: {format_number(failed)}"
-    )
-    
     await message.answer(
-        "Admin menyusiga qaytdingiz:",
+        "📤 Xabar fonda yuborilmoqda. Admin menyusiga qaytdingiz:",
         reply_markup=get_admin_main_menu()
     )
+
+    # Broadcast fonda, Postgres dagi job sifatida ishlaydi - handler bloklanmaydi
+    job_id = await broadcast_jobs.create(message, status_msg)
+    await status_msg.edit_text(
+        "📤 Xabar yuborilmoqda...",
+        reply_markup=get_broadcast_control_keyboard(job_id, 'running')
+    )
+    broadcast_jobs.start(message.bot, job_id)
+
+
+@router.callback_query(F.data.startswith("bc_"))
+async def broadcast_control_callback(callback: CallbackQuery):
+    """Broadcast jobni pauza / davom ettirish / bekor qilish"""
+    if not await has_permission_check(callback.from_user.id, "All write"):
+        await callback.answer("❌ Sizda bu amalni bajarish uchun ruxsat yo'q!", show_alert=True)
+        return
+
+    # bc_ACTION_JOBID
+    _, action, job_id = callback.data.split("_")
+    job_id = int(job_id)
+
+    if action == "pause":
+        changed = await broadcast_jobs.pause(job_id)
+        new_status = 'paused'
+    elif action == "resume":
+        changed = await broadcast_jobs.resume(callback.bot, job_id)
+        new_status = 'running'
+    elif action == "cancel":
+        changed = await broadcast_jobs.cancel(job_id)
+        new_status = 'cancelled'
+    else:
+        await callback.answer()
+        return
+
+    if not changed:
+        await callback.answer("❌ Bu amalni hozir bajarib bo'lmaydi!", show_alert=True)
+        return
+
+    await callback.answer("✅ Bajarildi")
+    try:
+        await callback.message.edit_reply_markup(
+            reply_markup=get_broadcast_control_keyboard(job_id, new_status)
+        )
+    except Exception:
+        pass
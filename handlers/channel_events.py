@@ -0,0 +1,22 @@
+from aiogram import Router
+from aiogram.types import ChatMemberUpdated
+
+from database.db import db
+from utils.helpers import is_member_status
+from utils.membership import channel_members
+
+router = Router()
+
+
+@router.chat_member()
+async def channel_member_updated(event: ChatMemberUpdated):
+    """Majburiy kanalga a'zo qo'shilganda / chiqqanda indeksni yangilash"""
+    channels = await db.get_all_channels()
+    if not any(channel['channel_id'] == event.chat.id for channel in channels):
+        return
+
+    channel_members.record_event(
+        event.chat.id,
+        event.new_chat_member.user.id,
+        is_member_status(event.new_chat_member)
+    )
@@ -1,15 +1,21 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated
+from aiogram.filters import Command, ChatMemberUpdatedFilter, KICKED, MEMBER
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
+import config
 from database.db import db
+from database.catalog import catalog
+from database.views import view_buffer
+from database.users import user_registry
+from database.settings import settings
 from utils.keyboards import (
     get_user_main_menu, get_film_parts_keyboard, 
     get_channels_keyboard, get_back_to_menu
 )
 from utils.helpers import check_user_subscription, format_film_info, format_number
+from utils.blocked_users import blocked_users
 
 router = Router()
 
@@ -27,23 +33,21 @@ async def cmd_start(message: Message, state: FSMContext):
     username = message.from_user.username
     full_name = message.from_user.full_name
     
-    # Foydalanuvchini bazaga qo'shish
-    await db.add_user(user_id, username, full_name)
+    # Foydalanuvchini qayd qilish (faqat yangi/o'zgargan profil, to'plab yoziladi)
+    user_registry.touch(user_id, username, full_name)
+    blocked_users.mark_active(user_id)
     
-    # Kanalga obuna tekshirish
-    channels = await db.get_all_channels()
+    # Kanalga obuna tekshirish (kanallar bo'lmasa darhol True qaytaradi)
+    is_subscribed, not_subscribed = await check_user_subscription(message.bot, user_id)
     
-    if channels:
-        is_subscribed, not_subscribed = await check_user_subscription(message.bot, user_id)
-        
-        if not is_subscribed:
-            keyboard = get_channels_keyboard(not_subscribed)
-            await message.answer(
-                "👋 Assalomu aleykum!\n\n"
-                "Botdan foydalanish uchun quyidagi kanallarga obuna bo'ling:",
-                reply_markup=keyboard
-            )
-            return
+    if not is_subscribed:
+        keyboard = get_channels_keyboard(not_subscribed)
+        await message.answer(
+            "👋 Assalomu aleykum!\n\n"
+            "Botdan foydalanish uchun quyidagi kanallarga obuna bo'ling:",
+            reply_markup=keyboard
+        )
+        return
     
     # Agar obuna bo'lgan bo'lsa yoki kanallar bo'lmasa
     await message.answer(
@@ -54,12 +58,25 @@ async def cmd_start(message: Message, state: FSMContext):
     )
 
 
+@router.my_chat_member(F.chat.type == "private", ChatMemberUpdatedFilter(member_status_changed=KICKED))
+async def user_blocked_bot(event: ChatMemberUpdated):
+    """Foydalanuvchi botni bloklaganda"""
+    blocked_users.mark_blocked(event.from_user.id)
+
+
+@router.my_chat_member(F.chat.type == "private", ChatMemberUpdatedFilter(member_status_changed=MEMBER))
+async def user_unblocked_bot(event: ChatMemberUpdated):
+    """Foydalanuvchi botni blokdan chiqarganda"""
+    blocked_users.mark_active(event.from_user.id)
+
+
 @router.callback_query(F.data == "check_subscription")
 async def check_subscription_callback(callback: CallbackQuery):
     """Obuna tekshirish tugmasi bosilganda"""
     user_id = callback.from_user.id
     
-    is_subscribed, not_subscribed = await check_user_subscription(callback.bot, user_id)
+    # Foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin - salbiy keshni chetlab o'tish
+    is_subscribed, not_subscribed = await check_user_subscription(callback.bot, user_id, force=True)
     
     if is_subscribed:
         await callback.message.delete()
@@ -113,18 +130,17 @@ async def process_film_code(message: Message, state: FSMContext):
     
     film_code = message.text.strip()
     
-    # Kinoni topish
-    film = await db.get_film(film_code)
+    # Kino va qismlarini topish (xotiradagi katalogdan)
+    bundle = await catalog.get_film_bundle(film_code)
     
-    if not film:
+    if not bundle:
         await message.answer(
             "❌ Bu kod bo'yicha kino topilmadi!\n\n"
             "Iltimos, to'g'ri kodni kiriting:"
         )
         return
     
-    # Kino qismlarini olish
-    parts = await db.get_film_parts(film_code)
+    film, parts = bundle.film, bundle.parts
     
     if not parts:
         await message.answer(
@@ -153,7 +169,7 @@ async def process_film_code(message: Message, state: FSMContext):
         )
         
         # Ko'rilganini qayd qilish
-        await db.add_film_view(film_code, message.from_user.id)
+        view_buffer.record(film_code, message.from_user.id)
     
     else:
         # Ko'p qismli bo'lsa, qismlar menyusini ko'rsatish
@@ -179,30 +195,31 @@ async def send_film_part(callback: CallbackQuery):
     _, film_code, part_num = callback.data.split("_")
     part_number = int(part_num)
     
-    # Qismni topish
-    part = await db.get_film_part(film_code, part_number)
-    film = await db.get_film(film_code)
+    # Kino va qismni topish
+    bundle = await catalog.get_film_bundle(film_code)
+    part = None
+    if bundle:
+        part = next((p for p in bundle.parts if p['part_number'] == part_number), None)
     
-    if not part or not film:
+    if not part:
         await callback.answer("❌ Qism topilmadi!", show_alert=True)
         return
     
     # Videoni yuborish
     await callback.message.answer_video(
         video=part['video_file_id'],
-        caption=f"🎬 <b>{film['name']}</b>\n📹 {part_number}-qism",
+        caption=f"🎬 <b>{bundle.film['name']}</b>\n📹 {part_number}-qism",
         reply_markup=get_user_main_menu()
     )
     
     await callback.answer(f"✅ {part_number}-qism yuborildi!")
     
     # Ko'rilganini qayd qilish
-    await db.add_film_view(film_code, callback.from_user.id)
+    view_buffer.record(film_code, callback.from_user.id)
     
     # Qolgan qismlar uchun keyboard qayta yuborish
-    parts_count = await db.get_parts_count(film_code)
-    if parts_count > 1:
-        keyboard = get_film_parts_keyboard(parts_count, film_code)
+    if bundle.parts_count > 1:
+        keyboard = get_film_parts_keyboard(bundle.parts_count, film_code)
         await callback.message.edit_reply_markup(reply_markup=keyboard)
 
 
@@ -252,10 +269,7 @@ async def contact_admin(message: Message):
         return
     
     # Admin contact link ni olish
-    admin_link = await db.get_setting('admin_contact_link')
-    
-    if not admin_link:
-        admin_link = "https://t.me/forever_projects"
+    admin_link = settings.get('admin_contact_link') or config.ADMIN_CONTACT_LINK
     
     await message.answer(
         f"📞 <b>Adminga murojat uchun quyidagi havolaga bosing:</b>\n\n"
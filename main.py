@@ -1,20 +1,37 @@
 import asyncio
+import hmac
 import logging
 from aiohttp import web
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
 
 import config
 from database.db import db
-from handlers import user, admin, admin_stats, admin_management
+from database.catalog import catalog
+from database.listener import pg_listener
+from database.settings import settings
+from database.storage import PostgresStorage
+from database.views import view_buffer
+from database.users import user_registry
+from database.rollups import daily_stats
+from database.partitions import film_view_partitions
+from handlers import user, admin, admin_stats, admin_management, channel_events
+from utils.broadcast_jobs import broadcast_jobs
+from utils.blocked_users import blocked_users, BlockedUserMiddleware
+from utils.membership import channel_members
+from utils.update_queue import update_queue, QueuedRequestHandler
+from utils.dedup import update_dedup
+from utils.webhook import webhook_manager
+from utils.db_session import DbSessionMiddleware
+from utils import prefork
 
 # Logging sozlamalari
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - [%(process)d] %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
@@ -23,7 +40,12 @@ bot = Bot(
     token=config.BOT_TOKEN,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
-dp = Dispatcher()
+bot.session.middleware(BlockedUserMiddleware(blocked_users))
+# FSM holatlari Postgres da - bir nechta worker bilan ishlash mumkin
+storage = PostgresStorage()
+dp = Dispatcher(storage=storage)
+# Har bir update uchun bitta bazaga ulanish (DB_REQUEST_TRANSACTION - bitta tranzaksiya)
+dp.update.middleware(DbSessionMiddleware())
 
 
 async def on_startup():
@@ -34,29 +56,75 @@ async def on_startup():
     await db.connect()
     logger.info("Database ga ulanish muvaffaqiyatli!")
 
-    # Jadvallarni yaratish
-    await db.create_tables()
-    logger.info("Database jadvallari tekshirildi/yaratildi")
+    # Sxema migratsiyalari (sxema oxirgi versiyada bo'lsa DDL bajarilmaydi)
+    applied = await db.create_tables()
+    if applied:
+        logger.info(f"Database sxemasi yangilandi: {applied} ta migratsiya bajarildi")
+    else:
+        logger.info("Database sxemasi oxirgi versiyada")
+
+    # Jarayonlararo kesh yangilanishlari (LISTEN/NOTIFY)
+    await pg_listener.start()
+
+    # Kino katalogi, adminlar ruxsatlari va sozlamalarni xotiraga yuklash
+    await catalog.start()
+    await db.start_acl()
+    await settings.start()
+    await storage.start()
+
+    # Bloklangan foydalanuvchilarni yozib borish
+    blocked_users.start()
+    channel_members.start()
+    user_registry.start()
+    view_buffer.start()
+    daily_stats.start()
+    film_view_partitions.start()
+
+    # Uzilib qolgan broadcastlarni davom ettirish
+    resumed = await broadcast_jobs.resume_all(bot)
+    if resumed:
+        logger.info(f"{resumed} ta broadcast job davom ettirildi")
+
+    # Webhook yangilanishlarini qayta ishlovchi workerlar
+    update_dedup.start()
+    update_queue.start(dp, bot)
 
     # Webhook o'rnatish
     webhook_url = f"{config.WEBHOOK_URL}{config.WEBHOOK_PATH}"
-    await bot.set_webhook(
-        url=webhook_url,
-        drop_pending_updates=True
-    )
-    logger.info(f"Webhook o'rnatildi: {webhook_url}")
+    # Kutilayotgan yangilanishlar saqlanadi; webhook bir xil bo'lsa qayta o'rnatilmaydi
+    await webhook_manager.setup(bot, webhook_url, dp.resolve_used_update_types())
 
     # Bot ma'lumotlarini ko'rsatish
     bot_info = await bot.get_me()
     logger.info(f"Bot ishga tushdi: @{bot_info.username}")
 
+    # Pre-fork rejimida masterga tayyorlik haqida xabar
+    prefork.notify_ready()
+
 
 async def on_shutdown():
     """Bot to'xtaganda"""
     logger.info("Bot to'xtatilmoqda...")
 
-    # Webhook o'chirish
-    await bot.delete_webhook(drop_pending_updates=True)
+    # Webhook o'chirilmaydi: to'xtab turgan vaqtda kelgan yangilanishlar
+    # Telegramda navbatda turadi va keyingi startda qabul qilinadi
+    await webhook_manager.stop()
+
+    # Navbatdagi yangilanishlarni tugatish
+    await update_queue.stop()
+    await update_dedup.stop()
+
+    # Broadcastlarni to'xtatish (progress saqlangan, keyingi startda davom etadi)
+    await broadcast_jobs.stop()
+    await user_registry.stop()
+    await view_buffer.stop()
+    await daily_stats.stop()
+    await film_view_partitions.stop()
+    await blocked_users.stop()
+    await channel_members.stop()
+    await catalog.stop()
+    await storage.close()
+    await pg_listener.stop()
 
     # Database ulanishini yopish
     await db.disconnect()
@@ -74,6 +142,7 @@ async def main():
     dp.include_router(admin.router)
     dp.include_router(admin_stats.router)
     dp.include_router(admin_management.router)
+    dp.include_router(channel_events.router)
 
     # Startup va shutdown handlerlar
     dp.startup.register(on_startup)
@@ -82,8 +151,10 @@ async def main():
     # Web application yaratish
     app = web.Application()
 
-    # Webhook handler
-    webhook_handler = SimpleRequestHandler(
+    # Webhook handler: darhol javob beradi, yangilanish ichki navbatda qayta ishlanadi
+    webhook_handler = QueuedRequestHandler(
+        update_queue,
+        update_dedup,
         dispatcher=dp,
         bot=bot
     )
@@ -96,15 +167,56 @@ async def main():
     async def root(request):
         return web.Response(text="Bot is running ✅")
 
+    # Ichki navbatlar holati
+    async def metrics(request):
+        # Faqat METRICS_TOKEN bilan: Authorization: Bearer <token>
+        expected = f"Bearer {config.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            raise web.HTTPUnauthorized()
+        stats = db.request_stats
+        updates = stats['updates'] or 1
+        return web.json_response({
+            'user_registry_pending': user_registry.pending,
+            'view_buffer_pending': view_buffer.pending,
+            'blocked_users_pending': blocked_users.pending,
+            'channel_members_pending': channel_members.pending,
+            'update_queue_depth': update_queue.depth,
+            'update_queue_size': update_queue.maxsize,
+            'updates_processed': update_queue.processed,
+            'updates_rejected': update_queue.rejected,
+            'updates_duplicate': update_dedup.duplicates,
+            'db_calls_per_update': round(stats['calls'] / updates, 2),
+            'db_acquires_per_update': round(stats['acquires'] / updates, 2),
+        })
+
     app.router.add_get('/', root)
     app.router.add_get('/health', root)
+    # Ichki metrikalar - token berilmagan bo'lsa endpoint umuman ochilmaydi
+    if config.METRICS_TOKEN:
+        app.router.add_get('/metrics', metrics)
 
     logger.info(f"Server ishga tushmoqda: 0.0.0.0:{config.PORT}")
     return app
 
 
+def run_worker(sock=None):
+    """Bitta worker: o'z event loop i, pool i va ulashilgan socket"""
+    app = asyncio.run(main())
+    if sock is None:
+        web.run_app(app, host='0.0.0.0', port=config.PORT)
+    else:
+        web.run_app(app, sock=sock, print=None)
+
+
 if __name__ == '__main__':
     try:
-        web.run_app(asyncio.run(main()), host='0.0.0.0', port=config.PORT)
+        worker_sock = prefork.worker_socket()
+        if worker_sock is not None:
+            # Pre-fork master ishga tushirgan worker
+            run_worker(worker_sock)
+        elif config.WEB_WORKERS > 1:
+            prefork.PreforkServer(config.WEB_WORKERS, host='0.0.0.0', port=config.PORT).run()
+        else:
+            run_worker()
     except (KeyboardInterrupt, SystemExit):
         logger.info("Bot to'xtatildi (KeyboardInterrupt)")
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Write-behind bufer uchun asos: yozuvlar kalit bo'yicha yig'iladi
+    (bir kalit uchun oxirgi qiymat g'olib) va davriy yoki bufer to'lganda
+    bitta so'rov bilan bazaga yoziladi
+    Voris klasslar write() ni amalga oshiradi
+    """
+
+    name = "batch"
+
+    def __init__(self, flush_interval: float = 5.0, max_pending: int = 500):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Hashable, object] = {}
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Bazaga yozilmagan yozuvlar soni"""
+        return len(self._pending)
+
+    def put(self, key: Hashable, value: object):
+        self._pending[key] = value
+        if len(self._pending) >= self.max_pending and not self._flush_lock.locked():
+            asyncio.ensure_future(self.flush())
+
+    async def write(self, items: Dict[Hashable, object]):
+        raise NotImplementedError
+
+    async def flush(self):
+        """Yig'ilgan yozuvlarni bazaga yozish"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            items, self._pending = self._pending, {}
+            try:
+                await self.write(items)
+            except Exception as e:
+                logger.error(f"{self.name}: bazaga yozishda xatolik: {e}")
+                # Keyingi flush da qayta urinish (yangi qiymatlar ustun)
+                self._pending = {**items, **self._pending}
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
@@ -0,0 +1,66 @@
+import logging
+from typing import Dict
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods.base import TelegramMethod, TelegramType
+
+from database.db import db
+from utils.batching import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+
+class BlockedUsersTracker(BatchWriter):
+    """
+    users.is_blocked ni to'plab (batch) yangilash
+    Bir foydalanuvchi uchun oxirgi holat g'olib bo'ladi
+    """
+
+    name = "blocked_users"
+
+    def mark_blocked(self, user_id: int):
+        """Foydalanuvchi botni bloklagan / o'chirilgan"""
+        self.put(user_id, True)
+
+    def mark_active(self, user_id: int):
+        """Foydalanuvchi yana botdan foydalanmoqda"""
+        self.put(user_id, False)
+
+    async def write(self, items: Dict[int, bool]):
+        blocked = [user_id for user_id, is_blocked in items.items() if is_blocked]
+        active = [user_id for user_id, is_blocked in items.items() if not is_blocked]
+        await db.set_users_blocked(blocked, True)
+        await db.set_users_blocked(active, False)
+        if blocked:
+            logger.info(f"{len(blocked)} ta foydalanuvchi bloklangan deb belgilandi")
+
+
+class BlockedUserMiddleware(BaseRequestMiddleware):
+    """
+    Bot API so'rovlari uchun middleware: foydalanuvchiga yuborishda
+    TelegramForbiddenError (bot bloklangan, akkaunt o'chirilgan) kelsa belgilab qo'yadi
+    """
+
+    def __init__(self, tracker: BlockedUsersTracker):
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        try:
+            return await make_request(bot, method)
+        except TelegramForbiddenError:
+            chat_id = getattr(method, 'chat_id', None)
+            # Faqat shaxsiy chatlar (musbat ID) - kanal/guruh xatolari emas
+            if isinstance(chat_id, int) and chat_id > 0:
+                self.tracker.mark_blocked(chat_id)
+            raise
+
+
+# Global tracker
+blocked_users = BlockedUsersTracker()
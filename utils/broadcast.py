@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+from aiogram.exceptions import TelegramRetryAfter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Global token-bucket limitchi
+    rate - sekundiga nechta xabar, capacity - bir martalik "portlash" hajmi
+    """
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Butun pipeline ni to'xtatib turish (TelegramRetryAfter uchun)"""
+        resume_at = time.monotonic() + seconds
+        if resume_at > self._paused_until:
+            self._paused_until = resume_at
+            self._tokens = 0.0
+            self._updated = resume_at
+
+    async def acquire(self):
+        """Bitta token olish - kerak bo'lsa kutish"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BroadcastStats:
+    """Broadcast jarayoni ko'rsatkichlari"""
+
+    def __init__(self, total: Optional[int] = None, success: int = 0, failed: int = 0):
+        self.total = total
+        self.success = success
+        self.failed = failed
+        self.retries = 0
+        self.started = time.monotonic()
+        # Qayta tiklangan job uchun tezlik faqat joriy sessiyadan hisoblanadi
+        self._base = success + failed
+
+    @property
+    def processed(self) -> int:
+        return self.success + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Sekundiga yuborilgan xabarlar"""
+        elapsed = self.elapsed
+        return (self.processed - self._base) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Taxminiy qolgan vaqt (sekund)"""
+        if self.total is None or self.rate <= 0:
+            return None
+        return max(0, self.total - self.processed) / self.rate
+
+
+class CursorTracker:
+    """
+    Uzluksiz tugallangan yuborishlar chegarasi (watermark)
+    position - shu user_id gacha (shu jumladan) hammasiga yuborib bo'lingan
+    """
+
+    def __init__(self, position: int = 0):
+        self.position = position
+        self._pending = deque()
+        self._done = set()
+
+    def dispatched(self, user_id: int):
+        self._pending.append(user_id)
+
+    def completed(self, user_id: int):
+        self._done.add(user_id)
+        while self._pending and self._pending[0] in self._done:
+            self.position = self._pending.popleft()
+            self._done.discard(self.position)
+
+
+Recipients = Union[Iterable[int], AsyncIterable[int]]
+SendFunc = Callable[[int], Awaitable[object]]
+ProgressFunc = Callable[[BroadcastStats], Awaitable[None]]
+
+
+class Broadcaster:
+    """
+    Cheklangan parallellik va global tezlik limiti bilan xabar tarqatish
+    TelegramRetryAfter kelsa butun pipeline pauza qilinadi va xabar qayta yuboriladi
+    """
+
+    def __init__(
+        self,
+        rate: float = config.BROADCAST_RATE,
+        concurrency: int = config.BROADCAST_CONCURRENCY,
+        max_retries: int = 5,
+        progress_interval: float = 5.0
+    ):
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.progress_interval = progress_interval
+
+    async def _send_one(self, send: SendFunc, user_id: int, stats: BroadcastStats):
+        for _ in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await send(user_id)
+                stats.success += 1
+                return
+            except TelegramRetryAfter as e:
+                stats.retries += 1
+                logger.warning(f"Flood limit: {e.retry_after}s pauza (user {user_id})")
+                self.bucket.pause(e.retry_after)
+            except Exception as e:
+                stats.failed += 1
+                logger.info(f"Foydalanuvchiga yuborishda xatolik {user_id}: {e}")
+                return
+
+        stats.failed += 1
+
+    async def run(
+        self,
+        recipients: Recipients,
+        send: SendFunc,
+        total: Optional[int] = None,
+        on_progress: Optional[ProgressFunc] = None,
+        stats: Optional[BroadcastStats] = None,
+        tracker: Optional[CursorTracker] = None
+    ) -> BroadcastStats:
+        """
+        Barcha qabul qiluvchilarga send(user_id) ni bajarish
+        recipients oqim (async iterator) bo'lishi mumkin - yuborish darhol boshlanadi
+        """
+        stats = stats or BroadcastStats(total)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                user_id = await queue.get()
+                try:
+                    if user_id is None:
+                        return
+                    await self._send_one(send, user_id, stats)
+                    if tracker:
+                        tracker.completed(user_id)
+                finally:
+                    queue.task_done()
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                try:
+                    await on_progress(stats)
+                except Exception as e:
+                    logger.debug(f"Progress yangilashda xatolik: {e}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        progress_task = asyncio.create_task(reporter()) if on_progress else None
+
+        async def feed(user_id: int):
+            if tracker:
+                tracker.dispatched(user_id)
+            await queue.put(user_id)
+
+        try:
+            if hasattr(recipients, '__aiter__'):
+                async for user_id in recipients:
+                    await feed(user_id)
+            else:
+                for user_id in recipients:
+                    await feed(user_id)
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            if progress_task:
+                progress_task.cancel()
+
+        logger.info(
+            f"Broadcast yakunlandi: {stats.success} ok, {stats.failed} xato, "
+            f"{stats.rate:.1f} msg/s, {stats.elapsed:.0f}s"
+        )
+        return stats
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import Dict
+
+from aiogram import Bot
+from aiogram.types import Message
+
+import config
+from database.db import db
+from database.settings import settings
+from utils.broadcast import Broadcaster, BroadcastStats, CursorTracker
+from utils.helpers import format_broadcast_progress
+from utils.keyboards import get_broadcast_control_keyboard
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastJobManager:
+    """
+    Postgres da saqlanadigan, qayta tiklanadigan broadcast joblar
+    Kursor (users.user_id watermark) har report_interval da saqlanadi - crash bo'lsa
+    faqat oxirgi checkpointdan keyingi yuborishlar qayta amalga oshiriladi
+    """
+
+    def __init__(self, batch_size: int = config.BROADCAST_BATCH_SIZE, report_interval: float = 5.0):
+        self.batch_size = batch_size
+        self.report_interval = report_interval
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._restart = set()
+
+    async def create(self, message: Message, status_msg: Message) -> int:
+        """Admin xabaridan yangi job yaratish (start() bilan ishga tushiriladi)"""
+        total = await db.get_active_users_count()
+        job_id = await db.create_broadcast_job(
+            from_chat_id=message.chat.id,
+            message_id=message.message_id,
+            created_by=message.from_user.id,
+            status_chat_id=status_msg.chat.id,
+            status_message_id=status_msg.message_id,
+            total_count=total
+        )
+        return job_id
+
+    def start(self, bot: Bot, job_id: int):
+        """Jobni shu jarayonda fonda ishga tushirish"""
+        task = self._tasks.get(job_id)
+        if task and not task.done():
+            # Hozirgi task pauza/bekor holatini ko'rib chiqib ketayotgan bo'lishi mumkin
+            self._restart.add(job_id)
+            return
+
+        task = asyncio.create_task(self._run(bot, job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda t: self._on_done(bot, job_id, t))
+
+    def _on_done(self, bot: Bot, job_id: int, task: asyncio.Task):
+        if self._tasks.get(job_id) is task:
+            del self._tasks[job_id]
+        if not task.cancelled() and task.exception():
+            logger.error(f"Broadcast job #{job_id} xatolik bilan to'xtadi", exc_info=task.exception())
+        if job_id in self._restart:
+            self._restart.discard(job_id)
+            if not task.cancelled():
+                self.start(bot, job_id)
+
+    async def resume_all(self, bot: Bot):
+        """Uzilib qolgan (running) joblarni qayta ishga tushirish"""
+        jobs = await db.get_running_broadcast_jobs()
+        for job in jobs:
+            logger.info(f"Broadcast job #{job['id']} davom ettirilmoqda (kursor: {job['cursor_user_id']})")
+            self.start(bot, job['id'])
+        return len(jobs)
+
+    async def stop(self):
+        """Barcha joblarni to'xtatish (holati 'running' bo'lib qoladi)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def pause(self, job_id: int) -> bool:
+        return await db.set_broadcast_job_status(job_id, 'paused', expected=['running'])
+
+    async def resume(self, bot: Bot, job_id: int) -> bool:
+        resumed = await db.set_broadcast_job_status(job_id, 'running', expected=['paused', 'running'])
+        if resumed:
+            self.start(bot, job_id)
+        return resumed
+
+    async def cancel(self, job_id: int) -> bool:
+        return await db.set_broadcast_job_status(job_id, 'cancelled', expected=['running', 'paused'])
+
+    async def report(self, bot: Bot, job, stats: BroadcastStats, status: str):
+        """Admin status xabarini yangilash"""
+        if not job['status_chat_id']:
+            return
+        try:
+            await bot.edit_message_text(
+                format_broadcast_progress(stats, status),
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id'],
+                reply_markup=get_broadcast_control_keyboard(job['id'], status)
+            )
+        except Exception as e:
+            logger.debug(f"Broadcast status xabarini yangilashda xatolik: {e}")
+
+    async def _run(self, bot: Bot, job_id: int):
+        """
+        Lockni olib jobni bajarish. Lock boshqa jarayonda bo'lsa - kutish: u jarayon
+        pauzani ko'rib chiqib ketayotgan bo'lishi mumkin, shunda job 'running' holatida
+        hech kim bajarmay qolmasligi uchun lock bo'shagach shu yerda davom ettiriladi
+        """
+        waiting = False
+        while True:
+            async with db.broadcast_job_lock(job_id) as locked:
+                if locked:
+                    await self._run_locked(bot, job_id)
+                    return
+            if await db.get_broadcast_job_status(job_id) != 'running':
+                return
+            if not waiting:
+                logger.info(f"Broadcast job #{job_id} boshqa jarayonda bajarilmoqda, lock kutilmoqda")
+                waiting = True
+            await asyncio.sleep(self.report_interval)
+
+    async def _run_locked(self, bot: Bot, job_id: int):
+        job = await db.get_broadcast_job(job_id)
+        if not job or job['status'] != 'running':
+            return
+
+        stats = BroadcastStats(job['total_count'], job['success_count'], job['failed_count'])
+        tracker = CursorTracker(job['cursor_user_id'])
+        stop = asyncio.Event()
+        final_status = 'done'
+
+        async def recipients():
+            async for user_id in db.iter_active_user_ids(tracker.position, self.batch_size):
+                if stop.is_set():
+                    return
+                yield user_id
+
+        async def send(user_id: int):
+            await bot.copy_message(user_id, job['from_chat_id'], job['message_id'])
+
+        async def checkpoint(stats: BroadcastStats):
+            nonlocal final_status
+            await db.update_broadcast_progress(job_id, tracker.position, stats.success, stats.failed)
+            status = await db.get_broadcast_job_status(job_id)
+            if status != 'running':
+                final_status = status
+                stop.set()
+            else:
+                await self.report(bot, job, stats, status)
+
+        broadcaster = Broadcaster(
+            rate=settings.get('broadcast_rate'),
+            concurrency=settings.get('broadcast_concurrency'),
+            progress_interval=self.report_interval
+        )
+        try:
+            await broadcaster.run(recipients(), send, stats=stats, tracker=tracker, on_progress=checkpoint)
+        finally:
+            await db.update_broadcast_progress(job_id, tracker.position, stats.success, stats.failed)
+
+        if final_status == 'done':
+            if not await db.set_broadcast_job_status(job_id, 'done', expected=['running']):
+                final_status = await db.get_broadcast_job_status(job_id)
+        await self.report(bot, job, stats, final_status)
+        logger.info(
+            f"Broadcast job #{job_id} {final_status}: {stats.success} ok, {stats.failed} xato"
+        )
+
+# Global broadcast job manager
+broadcast_jobs = BroadcastJobManager()
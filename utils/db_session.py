@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+import config
+from database.db import db
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Har bir update uchun bitta bazaga ulanish (birinchi so'rovda olinadi)
+    Handler ketma-ket chaqiradigan Database metodlari pool dan qayta-qayta
+    ulanish so'ramaydi; update tugagach ulanish pool ga qaytariladi
+    transactional=True - update ning barcha so'rovlari bitta tranzaksiyada
+    """
+
+    def __init__(self, transactional: bool = config.DB_REQUEST_TRANSACTION):
+        self.transactional = transactional
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with db.request_scope(self.transactional):
+            return await handler(event, data)
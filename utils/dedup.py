@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from array import array
+
+import config
+from database.db import db
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDeduplicator:
+    """
+    update_id bo'yicha qayta yuborilgan (retry) yangilanishlarni aniqlash
+    Oxirgi `size` ta ID halqa (ring) massivda saqlanadi; shared=True bo'lsa
+    workerlar orasida processed_updates jadvali orqali ham tekshiriladi
+    """
+
+    def __init__(
+        self,
+        size: int = config.UPDATE_DEDUP_SIZE,
+        shared: bool = config.UPDATE_DEDUP_SHARED,
+        ttl: int = config.UPDATE_DEDUP_TTL
+    ):
+        self.size = size
+        self.shared = shared
+        self.ttl = ttl
+        self._ring = array('q', [-1]) * size
+        self._pos = 0
+        self._seen = set()
+        self.duplicates = 0
+        self._task = None
+
+    def _remember(self, update_id: int):
+        old = self._ring[self._pos]
+        if old != -1:
+            self._seen.discard(old)
+        self._ring[self._pos] = update_id
+        self._pos = (self._pos + 1) % self.size
+        self._seen.add(update_id)
+
+    async def claim(self, update_id: int) -> bool:
+        """Yangilanish birinchi marta kelgan bo'lsa True (va belgilab qo'yiladi)"""
+        if update_id in self._seen:
+            self.duplicates += 1
+            return False
+        self._remember(update_id)
+
+        if self.shared:
+            try:
+                claimed = await db.claim_update(update_id)
+            except Exception as e:
+                # Baza ishlamasa ham yangilanish yo'qolmasin
+                logger.error(f"update_id ni tekshirishda xatolik: {e}")
+                claimed = True
+            if not claimed:
+                self.duplicates += 1
+                return False
+        return True
+
+    async def release(self, update_id: int):
+        """Qabul qilinmagan yangilanishni unutish - Telegram uni qayta yuboradi"""
+        self._seen.discard(update_id)
+        if self.shared:
+            try:
+                await db.release_update(update_id)
+            except Exception as e:
+                logger.error(f"update_id ni bo'shatishda xatolik: {e}")
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(600)
+            try:
+                await db.delete_old_processed_updates(self.ttl)
+            except Exception as e:
+                logger.error(f"processed_updates ni tozalashda xatolik: {e}")
+
+    def start(self):
+        if self.shared and self._task is None:
+            self._task = asyncio.create_task(self._cleanup_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Global deduplikator
+update_dedup = UpdateDeduplicator()
@@ -1,11 +1,43 @@
+import asyncio
+from datetime import datetime, timedelta
+
 from aiogram import Bot
 from aiogram.enums import ChatMemberStatus
+
 from database.db import db
+from utils.membership import channel_members
+
+
+async def _check_channel_member(bot: Bot, channel_id: int, user_id: int):
+    """
+    Bitta kanal uchun a'zolikni Bot API orqali tekshirish va keshlash
+    Returns: True/False, xatolik bo'lsa None
+    """
+    try:
+        member = await bot.get_chat_member(channel_id, user_id)
+    except Exception as e:
+        # Agar kanal yopiq bo'lsa yoki bot kanalda bo'lmasa, xatolikni e'tiborsiz qoldirish
+        print(f"Kanal tekshirishda xatolik: {channel_id} - {e}")
+        return None
+
+    is_member = is_member_status(member)
+    channel_members.record_lookup(channel_id, user_id, is_member)
+    return is_member
 
 
-async def check_user_subscription(bot: Bot, user_id: int) -> tuple[bool, list]:
+def is_member_status(member) -> bool:
+    """ChatMember obyekti kanal a'zosini bildiradimi"""
+    if member.status == ChatMemberStatus.RESTRICTED:
+        return member.is_member
+    return member.status not in [ChatMemberStatus.LEFT, ChatMemberStatus.KICKED]
+
+
+async def check_user_subscription(bot: Bot, user_id: int, force: bool = False) -> tuple[bool, list]:
     """
     Foydalanuvchining barcha majburiy kanallarga obuna ekanligini tekshirish
+    Avval chat_member yangilanishlaridan tuzilgan indeks ko'riladi,
+    noma'lum kanallar Bot API orqali parallel tekshiriladi
+    force=True - keshdagi "obuna emas" natijalari qayta tekshiriladi
     Returns: (is_subscribed, not_subscribed_channels)
     """
     channels = await db.get_all_channels()
@@ -15,15 +47,33 @@ async def check_user_subscription(bot: Bot, user_id: int) -> tuple[bool, list]:
     
     not_subscribed = []
     
-    for channel in channels:
-        try:
-            member = await bot.get_chat_member(channel['channel_id'], user_id)
-            if member.status in [ChatMemberStatus.LEFT, ChatMemberStatus.KICKED]:
+    def resolve(channel_list):
+        unknown = []
+        for channel in channel_list:
+            known = channel_members.get(channel['channel_id'], user_id)
+            if known is None or (force and not known):
+                unknown.append(channel)
+            elif not known:
                 not_subscribed.append(channel)
-        except Exception as e:
-            # Agar kanal yopiq bo'lsa yoki bot kanalda bo'lmasa, xatolikni e'tiborsiz qoldirish
-            print(f"Kanal tekshirishda xatolik: {channel['channel_id']} - {e}")
-            continue
+        return unknown
+    
+    # 1) xotiradagi indeks, 2) channel_members jadvali, 3) Bot API
+    unknown = resolve(channels)
+    if unknown and not force:
+        await channel_members.load(user_id, [channel['channel_id'] for channel in unknown])
+        unknown = resolve(unknown)
+    
+    if unknown:
+        results = await asyncio.gather(*(
+            _check_channel_member(bot, channel['channel_id'], user_id) for channel in unknown
+        ))
+        for channel, is_member in zip(unknown, results):
+            if is_member is False:
+                not_subscribed.append(channel)
+    
+    # Kanallar tartibini saqlash
+    order = {channel['channel_id']: idx for idx, channel in enumerate(channels)}
+    not_subscribed.sort(key=lambda channel: order[channel['channel_id']])
     
     return len(not_subscribed) == 0, not_subscribed
 
@@ -38,29 +88,59 @@ def format_film_info(film, parts_count=0):
     return info
 
 
+_CURSOR_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_page_cursor(row) -> str:
+    """(created_date, id) keyset kursorini callback_data uchun qisqa matnga aylantirish"""
+    micros = (row['created_date'] - _CURSOR_EPOCH) // timedelta(microseconds=1)
+    return f"{micros:x}_{row['id']:x}"
+
+
+def decode_page_cursor(created_hex: str, id_hex: str) -> tuple:
+    """encode_page_cursor teskarisi: (created_date, id)"""
+    created_date = _CURSOR_EPOCH + timedelta(microseconds=int(created_hex, 16))
+    return created_date, int(id_hex, 16)
+
+
 def format_number(num):
     """Raqamlarni chiroyli formatlash"""
     return "{:,}".format(num).replace(",", " ")
 
 
-async def broadcast_message(bot: Bot, message_to_send, from_chat_id=None):
-    """
-    Barcha foydalanuvchilarga xabar yuborish
-    message_to_send - forward qilinadigan message object
-    """
-    users = await db.get_all_users()
-    success = 0
-    failed = 0
-    
-    for user in users:
-        try:
-            await message_to_send.copy_to(user['user_id'])
-            success += 1
-        except Exception as e:
-            failed += 1
-            print(f"Foydalanuvchiga yuborishda xatolik {user['user_id']}: {e}")
-    
-    return success, failed
+def format_duration(seconds):
+    """Sekundlarni soat/daqiqa/sekund ko'rinishiga keltirish"""
+    if seconds is None:
+        return "—"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours} soat {minutes} daqiqa"
+    if minutes:
+        return f"{minutes} daqiqa {secs} sekund"
+    return f"{secs} sekund"
+
+
+BROADCAST_STATUS_TITLES = {
+    'running': "📤 <b>Xabar yuborilmoqda...</b>",
+    'paused': "⏸ <b>Xabar yuborish pauza qilindi</b>",
+    'cancelled': "⛔️ <b>Xabar yuborish bekor qilindi</b>",
+    'done': "✅ <b>Xabar yuborildi!</b>",
+}
+
+
+def format_broadcast_progress(stats, status='running'):
+    """Broadcast jarayoni matni"""
+    text = BROADCAST_STATUS_TITLES.get(status, status) + "\n\n"
+    if stats.total:
+        text += f"📊 {format_number(stats.processed)}/{format_number(stats.total)}\n"
+    text += f"✅ Muvaffaqiyatli: {format_number(stats.success)}\n"
+    text += f"❌ Xatolik: {format_number(stats.failed)}\n"
+    if status == 'running':
+        text += f"⚡️ Tezlik: {stats.rate:.1f} msg/s\n"
+        text += f"⏳ Qolgan vaqt: {format_duration(stats.eta)}"
+    return text
 
 
 def get_permission_name(perm_code):
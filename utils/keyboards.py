@@ -105,14 +105,19 @@ def get_channels_keyboard(channels):
     ])
 
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
-def get_pagination_keyboard(current_page: int, total_pages: int, prefix: str = "films"):
+def get_pagination_keyboard(current_page: int, total_pages: int, prefix: str = "films",
+                            prev_cursor: str = None, next_cursor: str = None):
+    # Kursor berilsa: PREFIX_page_PAGE_p|n_CURSOR (keyset), aks holda PREFIX_page_PAGE
     buttons = []
 
     if current_page > 0:
+        callback_data = f"{prefix}_page_{current_page - 1}"
+        if prev_cursor:
+            callback_data += f"_p_{prev_cursor}"
         buttons.append(
             InlineKeyboardButton(
                 text="◀️ Oldingi",
-                callback_data=f"{prefix}_page_{current_page - 1}"
+                callback_data=callback_data
             )
         )
 
@@ -124,10 +129,13 @@ def get_pagination_keyboard(current_page: int, total_pages: int, prefix: str = "
     )
 
     if current_page < total_pages - 1:
+        callback_data = f"{prefix}_page_{current_page + 1}"
+        if next_cursor:
+            callback_data += f"_n_{next_cursor}"
         buttons.append(
             InlineKeyboardButton(
                 text="Keyingi ▶️",
-                callback_data=f"{prefix}_page_{current_page + 1}"
+                callback_data=callback_data
             )
         )
 
@@ -147,3 +155,19 @@ def get_channel_management_keyboard():
         ],
         resize_keyboard=True
     )
+
+def get_broadcast_control_keyboard(job_id: int, status: str):
+    if status == 'running':
+        buttons = [
+            InlineKeyboardButton(text="⏸ Pauza", callback_data=f"bc_pause_{job_id}"),
+            InlineKeyboardButton(text="⛔️ Bekor qilish", callback_data=f"bc_cancel_{job_id}")
+        ]
+    elif status == 'paused':
+        buttons = [
+            InlineKeyboardButton(text="▶️ Davom ettirish", callback_data=f"bc_resume_{job_id}"),
+            InlineKeyboardButton(text="⛔️ Bekor qilish", callback_data=f"bc_cancel_{job_id}")
+        ]
+    else:
+        return None
+
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
@@ -0,0 +1,55 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import config
+from database.db import db
+from utils.batching import BatchWriter
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelMembershipIndex(BatchWriter):
+    """
+    (channel_id, user_id) -> a'zolik indeksi
+    chat_member yangilanishlari bilan to'ldiriladi, channel_members jadvalida saqlanadi
+    Xotirada faqat "issiq" juftliklar keshlanadi
+    """
+
+    name = "channel_members"
+
+    def __init__(self):
+        super().__init__(flush_interval=5.0, max_pending=1000)
+        self.cache = TTLCache(maxsize=config.SUBSCRIPTION_CACHE_SIZE)
+
+    def get(self, channel_id: int, user_id: int) -> Optional[bool]:
+        """Keshdagi a'zolik (noma'lum bo'lsa None)"""
+        return self.cache.get((channel_id, user_id))
+
+    def record_event(self, channel_id: int, user_id: int, is_member: bool):
+        """chat_member yangilanishidan kelgan aniq holat"""
+        self.cache.set((channel_id, user_id), is_member, config.CHANNEL_MEMBER_TTL)
+        self.put((channel_id, user_id), is_member)
+
+    def record_lookup(self, channel_id: int, user_id: int, is_member: bool):
+        """Bot API (get_chat_member) natijasi"""
+        ttl = config.SUBSCRIPTION_CACHE_TTL if is_member else config.SUBSCRIPTION_NEGATIVE_TTL
+        self.cache.set((channel_id, user_id), is_member, ttl)
+        # Salbiy natijalar saqlanmaydi - ular faqat qisqa muddat keshda turadi
+        if is_member:
+            self.put((channel_id, user_id), True)
+
+    async def load(self, user_id: int, channel_ids: List[int]):
+        """Foydalanuvchining saqlangan a'zoliklarini bitta so'rov bilan keshga yuklash"""
+        rows = await db.get_channel_memberships(user_id, channel_ids, config.CHANNEL_MEMBER_TTL)
+        for row in rows:
+            self.cache.set((row['channel_id'], user_id), row['is_member'], config.SUBSCRIPTION_CACHE_TTL)
+
+    async def write(self, items: Dict[Tuple[int, int], bool]):
+        await db.upsert_channel_members(
+            [(channel_id, user_id, is_member) for (channel_id, user_id), is_member in items.items()]
+        )
+
+
+# Global a'zolik indeksi
+channel_members = ChannelMembershipIndex()
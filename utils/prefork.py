@@ -0,0 +1,199 @@
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Master workerga ulashilgan socket va tayyorlik pipe ini shu env lar orqali beradi
+SOCKET_FD_ENV = 'PREFORK_SOCKET_FD'
+READY_FD_ENV = 'PREFORK_READY_FD'
+
+# Worker jarayonida: tayyorlik haqida masterga xabar beradigan pipe
+_ready_fd: Optional[int] = None
+
+
+def worker_socket() -> Optional[socket.socket]:
+    """Master ishga tushirgan worker bo'lsa - ulashilgan socket, aks holda None"""
+    global _ready_fd
+    fd = os.environ.pop(SOCKET_FD_ENV, None)
+    if fd is None:
+        return None
+    ready_fd = os.environ.pop(READY_FD_ENV, None)
+    if ready_fd is not None:
+        _ready_fd = int(ready_fd)
+    return socket.socket(fileno=int(fd))
+
+
+def notify_ready():
+    """Worker startup tugadi - masterga xabar berish (bitta jarayonda no-op)"""
+    global _ready_fd
+    if _ready_fd is None:
+        return
+    try:
+        os.write(_ready_fd, b'1')
+        os.close(_ready_fd)
+    except OSError:
+        pass
+    _ready_fd = None
+
+
+class PreforkServer:
+    """
+    Pre-fork master: portni bir marta ochadi va N ta worker jarayonni ishga tushiradi
+    Har bir worker fork + exec (argv, odatda `python main.py`) - yangi interpretator,
+    o'z event loop i va asyncpg pool i bilan, ulashilgan socketdan qabul qiladi
+
+    Signallar:
+        SIGTERM/SIGINT - workerlarni to'xtatib chiqish
+        SIGHUP - navbatma-navbat qayta ishga tushirish (yangi worker tayyor
+                 bo'lgandan keyin eskisi to'xtatiladi - port bo'sh qolmaydi).
+                 Workerlar kod va .env ni qaytadan yuklaydi; masterning o'z
+                 sozlamalari (WEB_WORKERS, PORT) faqat to'liq restartda o'zgaradi
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        host: str,
+        port: int,
+        boot_timeout: float = 60.0,
+        stop_timeout: float = 30.0
+    ):
+        self.argv: List[str] = [sys.executable] + sys.argv
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.boot_timeout = boot_timeout
+        self.stop_timeout = stop_timeout
+        self._sock: Optional[socket.socket] = None
+        self._children: Dict[int, int] = {}  # pid -> ready pipe (o'qish uchi)
+        self._stopping = False
+        self._reload = False
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.setblocking(False)
+        return sock
+
+    def _spawn(self) -> int:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Worker: yangi interpretator (yangi kod), socket va pipe meros qilinadi
+            try:
+                os.close(read_fd)
+                os.set_inheritable(write_fd, True)
+                self._sock.set_inheritable(True)
+                env = dict(os.environ)
+                env[SOCKET_FD_ENV] = str(self._sock.fileno())
+                env[READY_FD_ENV] = str(write_fd)
+                os.execve(self.argv[0], self.argv, env)
+            except BaseException:
+                logger.exception("Workerni ishga tushirib bo'lmadi")
+            finally:
+                os._exit(1)
+
+        os.close(write_fd)
+        self._children[pid] = read_fd
+        logger.info(f"Worker ishga tushirildi (pid={pid})")
+        return pid
+
+    def _wait_ready(self, pid: int) -> bool:
+        """Worker on_startup ni tugatguncha kutish"""
+        fd = self._children.get(pid)
+        if fd is None:
+            return False
+        readable, _, _ = select.select([fd], [], [], self.boot_timeout)
+        return bool(readable) and os.read(fd, 1) == b'1'
+
+    def _forget(self, pid: int):
+        fd = self._children.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _terminate(self, pid: int, send: bool = True):
+        """Workerni SIGTERM bilan to'xtatish (stop_timeout dan keyin SIGKILL)"""
+        if send:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self._forget(pid)
+                return
+        deadline = time.monotonic() + self.stop_timeout
+        while time.monotonic() < deadline:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            time.sleep(0.2)
+        else:
+            logger.warning(f"Worker {pid} o'z vaqtida to'xtamadi, SIGKILL")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self._forget(pid)
+
+    def _rolling_restart(self):
+        logger.info("Workerlar navbatma-navbat qayta ishga tushirilmoqda...")
+        for old_pid in list(self._children):
+            if self._stopping:
+                return
+            new_pid = self._spawn()
+            if not self._wait_ready(new_pid):
+                logger.error(f"Yangi worker {new_pid} tayyor bo'lmadi, qayta ishga tushirish to'xtatildi")
+                self._terminate(new_pid)
+                return
+            self._terminate(old_pid)
+        logger.info("Qayta ishga tushirish tugadi")
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload = True
+        else:
+            self._stopping = True
+
+    def run(self):
+        self._sock = self._bind()
+        logger.info(f"Master (pid={os.getpid()}): {self.host}:{self.port}, {self.workers} ta worker")
+
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGHUP, self._on_signal)
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._rolling_restart()
+
+            # Kutilmaganda to'xtagan workerlarni qayta ishga tushirish
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self._children:
+                self._forget(pid)
+                if not self._stopping:
+                    logger.warning(f"Worker {pid} to'xtadi (status={status}), qayta ishga tushirilmoqda")
+                    time.sleep(1)
+                    self._spawn()
+                continue
+            time.sleep(0.5)
+
+        logger.info("Workerlar to'xtatilmoqda...")
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self._children):
+            self._terminate(pid, send=False)
+        self._sock.close()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+import config
+from utils.dedup import UpdateDeduplicator
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """
+    Webhook yangilanishlari uchun chegaralangan ichki navbat
+    Yangilanishlar foydalanuvchi ID si bo'yicha shardlarga bo'linadi: bitta
+    foydalanuvchining yangilanishlari ketma-ket, turli foydalanuvchilarniki parallel
+    """
+
+    def __init__(self, workers: int = config.UPDATE_WORKERS, maxsize: int = config.UPDATE_QUEUE_SIZE):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._dispatcher: Optional[Dispatcher] = None
+        self._bot: Optional[Bot] = None
+        self.depth = 0
+        self.processed = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _shard_key(update: Update) -> int:
+        event = update.event
+        user = getattr(event, 'from_user', None)
+        if user is not None:
+            return user.id
+        chat = getattr(event, 'chat', None)
+        if chat is not None:
+            return chat.id
+        return update.update_id
+
+    @property
+    def full(self) -> bool:
+        """Yangi yangilanish qabul qilinmaydi"""
+        return self.depth >= self.maxsize or not self._queues
+
+    def put(self, update: Update) -> bool:
+        """Navbatga qo'shish. Navbat to'la bo'lsa False"""
+        if self.full:
+            self.rejected += 1
+            return False
+        self.depth += 1
+        self._queues[self._shard_key(update) % self.workers].put_nowait(update)
+        return True
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            if update is None:
+                return
+            try:
+                await self._dispatcher.feed_update(self._bot, update)
+            except Exception as e:
+                logger.error(f"Update {update.update_id} ni qayta ishlashda xatolik: {e}")
+            finally:
+                self.depth -= 1
+                self.processed += 1
+
+    def start(self, dispatcher: Dispatcher, bot: Bot):
+        if self._tasks:
+            return
+        self._dispatcher = dispatcher
+        self._bot = bot
+        self._queues = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, log_interval: float = 5.0):
+        """
+        Yangi yangilanishlarni qabul qilmaslik (webhook 429 qaytaradi - Telegram qayta
+        yuboradi) va navbatdagilarning hammasini oxirigacha qayta ishlash
+        Ular Telegramga allaqachon tasdiqlangan - bekor qilinsa qayta kelmaydi
+        """
+        if not self._tasks:
+            return
+        queues, self._queues = self._queues, []
+        for queue in queues:
+            queue.put_nowait(None)
+        pending = set(self._tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=log_interval)
+            if pending:
+                logger.info(f"Navbatdagi yangilanishlar tugatilmoqda: {self.depth} ta qoldi")
+        self._tasks = []
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Webhook so'rovini darhol tasdiqlaydi (200), yangilanishni UpdateQueue ga qo'yadi
+    Navbat to'la yoki to'xtatilayotgan bo'lsa 429 qaytaradi - Telegram keyinroq qayta yuboradi
+    Qayta yuborilgan (allaqachon qabul qilingan) update_id lar dispatchga yetmaydi
+
+    Yo'qotish oynasi: tasdiqlangan, lekin hali qayta ishlanmagan yangilanishlar faqat
+    xotirada turadi. Oddiy to'xtashda (SIGTERM) navbat to'liq tugatiladi; jarayon
+    o'ldirilsa (SIGKILL, crash, OOM) navbatdagi (ko'pi bilan UPDATE_QUEUE_SIZE ta)
+    yangilanishlar yo'qoladi
+    """
+
+    def __init__(self, queue: UpdateQueue, dedup: UpdateDeduplicator, **kwargs):
+        super().__init__(**kwargs)
+        self.queue = queue
+        self.dedup = dedup
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+
+        if self.queue.full:
+            self.queue.rejected += 1
+            return web.Response(status=429, headers={'Retry-After': '1'}, text="Queue is full")
+
+        data = await request.json(loads=bot.session.json_loads)
+        update = Update.model_validate(data, context={"bot": bot})
+        if await self.dedup.claim(update.update_id):
+            if not self.queue.put(update):
+                await self.dedup.release(update.update_id)
+                return web.Response(status=429, headers={'Retry-After': '1'}, text="Queue is full")
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+
+# Global navbat
+update_queue = UpdateQueue()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from aiogram import Bot
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookManager:
+    """
+    Webhookni o'rnatish va restartdan keyin to'plangan yangilanishlarni qabul qilish
+    Kutilayotgan yangilanishlar tashlab yuborilmaydi: backlog bo'lsa webhook
+    ko'proq parallel ulanish bilan o'rnatiladi va backlog tugagach oddiy rejimga qaytadi
+    """
+
+    def __init__(
+        self,
+        max_connections: int = config.WEBHOOK_MAX_CONNECTIONS,
+        catchup_connections: int = config.WEBHOOK_CATCHUP_CONNECTIONS,
+        poll_interval: float = 5.0
+    ):
+        self.max_connections = max_connections
+        self.catchup_connections = catchup_connections
+        self.poll_interval = poll_interval
+        self._task = None
+
+    async def setup(self, bot: Bot, url: str, allowed_updates: List[str]):
+        info = await bot.get_webhook_info()
+        pending = info.pending_update_count or 0
+
+        if pending:
+            logger.info(f"Kutilayotgan yangilanishlar: {pending} ta - tezkor qabul qilish rejimi")
+            await self._set(bot, url, allowed_updates, self.catchup_connections)
+            if self._task is None:
+                self._task = asyncio.create_task(self._catch_up(bot, url, allowed_updates, pending))
+        elif self._matches(info, url, allowed_updates, self.max_connections):
+            logger.info(f"Webhook allaqachon o'rnatilgan: {url}")
+        else:
+            await self._set(bot, url, allowed_updates, self.max_connections)
+            logger.info(f"Webhook o'rnatildi: {url}")
+
+    @staticmethod
+    def _matches(info, url: str, allowed_updates: List[str], max_connections: int) -> bool:
+        return (
+            info.url == url
+            and set(info.allowed_updates or []) == set(allowed_updates)
+            and info.max_connections == max_connections
+        )
+
+    @staticmethod
+    async def _set(bot: Bot, url: str, allowed_updates: List[str], max_connections: int):
+        await bot.set_webhook(
+            url=url,
+            allowed_updates=allowed_updates,
+            max_connections=max_connections,
+            drop_pending_updates=False
+        )
+
+    async def _catch_up(self, bot: Bot, url: str, allowed_updates: List[str], total: int):
+        """Backlog tugaguncha progressni log qilish, keyin oddiy rejimga o'tish"""
+        started = time.monotonic()
+        pending: Optional[int] = total
+        try:
+            while pending:
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    pending = (await bot.get_webhook_info()).pending_update_count or 0
+                except Exception as e:
+                    logger.error(f"Webhook holatini olishda xatolik: {e}")
+                    continue
+                elapsed = time.monotonic() - started
+                done = max(total - pending, 0)
+                rate = done / elapsed if elapsed > 0 else 0
+                logger.info(
+                    f"Backlog: {done}/{total} qabul qilindi, {pending} ta qoldi ({rate:.1f} upd/s)"
+                )
+
+            await self._set(bot, url, allowed_updates, self.max_connections)
+            logger.info(
+                f"Backlog tugadi ({total} ta, {time.monotonic() - started:.0f}s) - oddiy rejimga o'tildi"
+            )
+        finally:
+            self._task = None
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Global webhook menejeri
+webhook_manager = WebhookManager()